@@ -1,6 +1,15 @@
 from django.contrib import admin
+from django.db import transaction
+from django.db.models.functions import Substr
+from django.utils import timezone
 from django.utils.html import format_html
 from .models import Product, ContactMessage
+from .cache import bump_catalogue_generation
+from .images import image_metadata, thumbnail_url
+from .pagination import EstimatedCountPaginator
+from .prerender import on_edit as prerender_on_edit
+from .routers import pin_primary_reads
+from .warming import on_edit as rewarm_on_edit, product_paths
 
 
 # Customize Admin Site Header
@@ -9,6 +18,11 @@ admin.site.site_title = "DOMEMILY Fashion"
 admin.site.index_title = "Welcome to Domemily Dashboard"
 
 
+def is_changelist(request):
+    match = request.resolver_match
+    return bool(match and match.url_name and match.url_name.endswith('_changelist'))
+
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     """Enhanced admin interface for managing products/dresses."""
@@ -17,21 +31,20 @@ class ProductAdmin(admin.ModelAdmin):
     list_display = ['image_preview', 'name', 'category', 'dress_type_display', 'formatted_price', 'is_available', 'created_at']
     list_display_links = ['image_preview', 'name']
     
-    # Filtering and searching
+    # Filtering and searching (category, availability and date are indexed)
     list_filter = ['category', 'dress_type', 'is_available', 'created_at']
     search_fields = ['name', 'description']
     
-    # Editable fields directly in list view
-    list_editable = ['is_available']
+    # Availability is toggled with the bulk actions below: list_editable
+    # renders a form per row and saves (and invalidates caches) row by row
     
     # Ordering
     ordering = ['-created_at']
     
-    # Items per page
+    # Items per page; large tables get an estimated count instead of COUNT(*)
     list_per_page = 20
-    
-    # Date hierarchy for easy navigation
-    date_hierarchy = 'created_at'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     # Prepopulate slug from name
     prepopulated_fields = {'slug': ('name',)}
@@ -59,6 +72,19 @@ class ProductAdmin(admin.ModelAdmin):
     # Make image_tag read-only
     readonly_fields = ['image_tag', 'created_at']
     
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if is_changelist(request):
+            # The list never shows the long text or video columns
+            queryset = queryset.defer('description', 'video', 'video_url')
+        return queryset
+    
+    def save_model(self, request, obj, form, change):
+        if 'image' in form.changed_data:
+            obj.image_meta = image_metadata(obj.image) if obj.image else {}
+            obj.build_thumbnails()
+        super().save_model(request, obj, form, change)
+    
     def dress_type_display(self, obj):
         """Display dress type or dash if not applicable."""
         if obj.dress_type:
@@ -70,20 +96,23 @@ class ProductAdmin(admin.ModelAdmin):
     # Custom methods for display
     def image_preview(self, obj):
         """Show small thumbnail in list view."""
-        if obj.image:
+        url = obj.get_image_display_url()
+        if url:
             return format_html(
-                '<img src="{}" style="width: 50px; height: 65px; object-fit: cover; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);" />',
-                obj.image.url
+                '<img src="{}" width="50" height="65" loading="lazy" decoding="async" style="width: 50px; height: 65px; object-fit: cover; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);" />',
+                # 2x for high-density screens
+                thumbnail_url(url, obj.image, 100, 130, obj.image_meta)
             )
         return format_html('<span style="color: #999;">No image</span>')
     image_preview.short_description = 'Preview'
     
     def image_tag(self, obj):
         """Show larger image preview in detail view."""
-        if obj.image:
+        url = obj.get_image_display_url()
+        if url:
             return format_html(
-                '<img src="{}" style="max-width: 300px; max-height: 400px; border-radius: 12px; box-shadow: 0 4px 12px rgba(0,0,0,0.15);" />',
-                obj.image.url
+                '<img src="{}" width="300" height="400" decoding="async" style="max-width: 300px; max-height: 400px; object-fit: cover; border-radius: 12px; box-shadow: 0 4px 12px rgba(0,0,0,0.15);" />',
+                thumbnail_url(url, obj.image, 600, 800, obj.image_meta)
             )
         return format_html('<span style="color: #999; font-style: italic;">No image uploaded yet</span>')
     image_tag.short_description = 'Image Preview'
@@ -99,28 +128,47 @@ class ProductAdmin(admin.ModelAdmin):
     
     @admin.action(description='✅ Mark selected products as available')
     def make_available(self, request, queryset):
-        updated = queryset.update(is_available=True)
+        updated = self.set_availability(queryset, True)
         self.message_user(request, f'{updated} product(s) marked as available.')
     
     @admin.action(description='❌ Mark selected products as unavailable')
     def make_unavailable(self, request, queryset):
-        updated = queryset.update(is_available=False)
+        updated = self.set_availability(queryset, False)
         self.message_user(request, f'{updated} product(s) marked as unavailable.')
 
+    def set_availability(self, queryset, available):
+        """
+        Bulk update, then everything the post_save signals would have done
+        (update() skips them): invalidate cached pages and re-render and
+        re-warm the prerendered pages of the products changed.
+        """
+        products = list(queryset.only('pk', 'slug', 'image', 'image_url'))
+        updated = queryset.update(is_available=available, updated_at=timezone.now())
+        bump_catalogue_generation()
+        transaction.on_commit(bump_catalogue_generation)
+        pin_primary_reads()
+        entries = [f'product {product.pk} {product.slug}' for product in products]
+        paths = [path for product in products for path in product_paths(product)]
+        transaction.on_commit(lambda: prerender_on_edit(entries))
+        transaction.on_commit(lambda: rewarm_on_edit(paths))
+        return updated
+
 
 @admin.register(ContactMessage)
 class ContactMessageAdmin(admin.ModelAdmin):
     """Admin interface for viewing contact form submissions."""
     
-    list_display = ['name', 'email', 'short_message', 'created_at', 'is_read']
-    list_filter = ['created_at']
+    list_display = ['name', 'email', 'short_message', 'created_at', 'status']
+    # Both filters are covered by the inbox indexes
+    list_filter = ['is_read', 'created_at']
     search_fields = ['name', 'email', 'message']
     ordering = ['-created_at']
     list_per_page = 25
-    date_hierarchy = 'created_at'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     # Make messages read-only (they come from the contact form)
-    readonly_fields = ['name', 'email', 'message', 'created_at']
+    readonly_fields = ['name', 'email', 'message', 'created_at', 'is_read', 'handled_at']
     
     fieldsets = (
         ('Contact Details', {
@@ -130,22 +178,59 @@ class ContactMessageAdmin(admin.ModelAdmin):
             'fields': ('message',)
         }),
         ('Metadata', {
-            'fields': ('created_at',),
+            'fields': ('created_at', 'is_read', 'handled_at'),
             'classes': ('collapse',)
         }),
     )
     
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if is_changelist(request):
+            # Only load the start of each message for the list
+            queryset = queryset.defer('message').annotate(message_preview=Substr('message', 1, 51))
+        return queryset
+    
     def short_message(self, obj):
         """Truncate long messages in list view."""
-        if len(obj.message) > 50:
-            return f"{obj.message[:50]}..."
-        return obj.message
+        message = obj.message_preview if hasattr(obj, 'message_preview') else obj.message
+        if len(message) > 50:
+            return f"{message[:50]}..."
+        return message
     short_message.short_description = 'Message'
     
-    def is_read(self, obj):
-        """Visual indicator (placeholder - could be extended with actual read tracking)."""
+    def status(self, obj):
+        """Visual read/handled indicator."""
+        if obj.handled_at:
+            return format_html('<span style="color: #999;">✔</span> Handled')
+        if obj.is_read:
+            return format_html('<span style="color: #8B4513;">●</span> Read')
         return format_html('<span style="color: #28a745;">●</span> New')
-    is_read.short_description = 'Status'
+    status.short_description = 'Status'
+    status.admin_order_field = 'is_read'
+    
+    # Custom actions
+    actions = ['mark_read', 'mark_unread', 'mark_handled']
+    
+    @admin.action(description='👁 Mark selected messages as read')
+    def mark_read(self, request, queryset):
+        updated = queryset.filter(is_read=False).update(is_read=True)
+        self.message_user(request, f'{updated} message(s) marked as read.')
+    
+    @admin.action(description='✉️ Mark selected messages as unread')
+    def mark_unread(self, request, queryset):
+        updated = queryset.update(is_read=False, handled_at=None)
+        self.message_user(request, f'{updated} message(s) marked as unread.')
+    
+    @admin.action(description='✅ Mark selected messages as handled')
+    def mark_handled(self, request, queryset):
+        updated = queryset.filter(handled_at__isnull=True).update(is_read=True, handled_at=timezone.now())
+        self.message_user(request, f'{updated} message(s) marked as handled.')
+    
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        # Opening a message marks it read
+        if request.method == 'GET':
+            ContactMessage.objects.filter(pk=object_id, is_read=False).update(is_read=True)
+        return super().change_view(request, object_id, form_url, extra_context)
     
     # Disable add/edit since these come from the contact form
     def has_add_permission(self, request):
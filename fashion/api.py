@@ -0,0 +1,30 @@
+"""
+REST API views. DRF is comparatively slow to import, so fashion.urls routes
+here lazily and the storefront never pays for it unless the API is used.
+"""
+
+from rest_framework import generics, status
+from rest_framework.response import Response
+
+from .contact import enqueue_contact_message
+from .models import ContactMessage, Product
+from .serializers import ContactMessageSerializer, ProductSerializer
+from .throttles import ContactTokenBucketThrottle
+
+class ProductListAPIView(generics.ListAPIView):
+    queryset = Product.objects.filter(is_available=True)
+    serializer_class = ProductSerializer
+
+
+class ContactCreateAPIView(generics.CreateAPIView):
+    queryset = ContactMessage.objects.all()
+    serializer_class = ContactMessageSerializer
+    throttle_classes = [ContactTokenBucketThrottle]
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # Buffered for a batch insert; duplicates are accepted but dropped
+        # so spammers can't tell what got through
+        enqueue_contact_message(**serializer.validated_data)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
\ No newline at end of file
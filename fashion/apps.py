@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class FashionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'fashion'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .profiling import instrument_templates
+        instrument_templates()
@@ -0,0 +1 @@
+"""Local benchmarking helpers: a threaded HTTP load generator and server launchers."""
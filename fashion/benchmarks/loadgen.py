@@ -0,0 +1,144 @@
+import re
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlsplit
+
+# Production settings redirect plain HTTP to HTTPS; pretend we sit behind the proxy
+DEFAULT_HEADERS = {
+    'X-Forwarded-Proto': 'https',
+    'Accept-Encoding': 'gzip, br',
+}
+
+# ProfilingMiddleware reports the query count in Server-Timing: db;...;desc="N queries"
+SERVER_TIMING_QUERIES_RE = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Time a redirecting response (e.g. after a form POST) on its own."""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+opener = urllib.request.build_opener(NoRedirect)
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def summarize(latencies, errors, elapsed, queries=None):
+    """Throughput, latency percentiles (milliseconds) and query counts for one run."""
+    stats = {
+        'requests': len(latencies),
+        'errors': errors,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(max(latencies, default=0) * 1000, 2),
+    }
+    if queries:
+        stats['queries_avg'] = round(sum(queries) / len(queries), 2)
+        stats['queries_max'] = max(queries)
+    return stats
+
+
+def run_load(url=None, concurrency=10, duration=10.0, headers=None, timeout=30.0,
+             make_request=None):
+    """
+    Hammer `url` from `concurrency` threads for `duration` seconds.
+    Pass `make_request` (a callable returning a urllib Request) instead of a URL
+    to vary requests, e.g. POSTs or rotating product slugs.
+    Each thread issues requests back-to-back; returns summarize() output.
+    """
+    request_headers = {**DEFAULT_HEADERS, **(headers or {})}
+    if make_request is None:
+        def make_request():
+            return urllib.request.Request(url, headers=request_headers)
+
+    latencies = []
+    queries = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        local, local_queries, failed = [], [], 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                with opener.open(make_request(), timeout=timeout) as response:
+                    response.read()
+                    server_timing = response.headers.get('Server-Timing', '')
+            except urllib.error.HTTPError as error:
+                # Redirects surface as HTTPError because they aren't followed
+                error.read()
+                if error.code >= 400:
+                    failed += 1
+                    continue
+                server_timing = error.headers.get('Server-Timing', '')
+            except (urllib.error.URLError, OSError):
+                failed += 1
+                continue
+            local.append(time.perf_counter() - started)
+            match = SERVER_TIMING_QUERIES_RE.search(server_timing)
+            if match:
+                local_queries.append(int(match.group(1)))
+        with lock:
+            latencies.extend(local)
+            queries.extend(local_queries)
+            errors[0] += failed
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, errors[0], time.perf_counter() - started, queries)
+
+
+def slow_clients(url, count, duration, body_size=4096, interval=0.5):
+    """
+    Open `count` connections that trickle a POST body one byte every `interval`
+    seconds, the way a client on a poor mobile link uploads a form.
+    Returns the started threads; they stop on their own after `duration`.
+    """
+    parts = urlsplit(url)
+    deadline = time.perf_counter() + duration
+
+    def trickle():
+        try:
+            sock = socket.create_connection((parts.hostname, parts.port or 80), timeout=duration + 5)
+        except OSError:
+            return
+        with sock:
+            head = (
+                f"POST {parts.path or '/'} HTTP/1.1\r\n"
+                f"Host: {parts.netloc}\r\n"
+                "X-Forwarded-Proto: https\r\n"
+                "Content-Type: application/x-www-form-urlencoded\r\n"
+                f"Content-Length: {body_size}\r\n\r\n"
+            )
+            try:
+                sock.sendall(head.encode())
+                while time.perf_counter() < deadline:
+                    sock.sendall(b'a')
+                    time.sleep(interval)
+            except OSError:
+                pass
+
+    threads = [threading.Thread(target=trickle, daemon=True) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads
@@ -0,0 +1,8 @@
+# Load-test profile for the production server configuration.
+# Each scenario is run back-to-back against every server under test.
+SERVER_PROFILE = [
+    {'name': 'collection', 'path': '/collection/', 'concurrency': 16, 'duration': 10.0},
+    {'name': 'api-product-list', 'path': '/api/products/', 'concurrency': 16, 'duration': 10.0},
+    {'name': 'contact', 'path': '/contact/', 'concurrency': 16, 'duration': 10.0},
+    {'name': 'readyz', 'path': '/readyz/', 'concurrency': 32, 'duration': 5.0},
+]
@@ -0,0 +1,47 @@
+# Lower is better for latency and queries, higher is better for throughput
+LATENCY_KEYS = ['p50_ms', 'p95_ms', 'p99_ms']
+
+# Absolute p95 ceilings (ms) that hold at every catalogue size, up to 100k rows
+LATENCY_BUDGETS_MS = {
+    'admin-products': 250,
+    'admin-contact': 250,
+}
+
+
+def compare(results, baseline, tolerance=0.15):
+    """
+    Return human-readable regressions of `results` against `baseline`.
+    Both are run_benchmarks JSON documents; latency or throughput may move by
+    `tolerance` (a fraction) before it counts, query counts may not grow at all.
+    """
+    regressions = []
+    for size, scenarios in results['results'].items():
+        for name, stats in scenarios.items():
+            before = baseline.get('results', {}).get(size, {}).get(name)
+            if not before:
+                continue
+            label = f'{name} @ {size} products'
+            for key in LATENCY_KEYS:
+                if before.get(key) and stats[key] > before[key] * (1 + tolerance):
+                    regressions.append(f'{label}: {key} {before[key]} -> {stats[key]}')
+            if before.get('throughput_rps') and \
+                    stats['throughput_rps'] < before['throughput_rps'] * (1 - tolerance):
+                regressions.append(
+                    f"{label}: throughput {before['throughput_rps']} -> {stats['throughput_rps']} req/s"
+                )
+            if stats.get('queries_max', 0) > before.get('queries_max', 0):
+                regressions.append(
+                    f"{label}: queries_max {before.get('queries_max', 0)} -> {stats['queries_max']}"
+                )
+    return regressions
+
+
+def check_budgets(results, budgets=LATENCY_BUDGETS_MS):
+    """Return scenarios of a run_benchmarks document whose p95 exceeds its budget."""
+    violations = []
+    for size, scenarios in results['results'].items():
+        for name, stats in scenarios.items():
+            budget = budgets.get(name)
+            if budget is not None and stats['p95_ms'] > budget:
+                violations.append(f"{name} @ {size} products: p95 {stats['p95_ms']} ms > {budget} ms budget")
+    return violations
@@ -0,0 +1,103 @@
+import io
+import random
+import urllib.request
+import uuid
+from http.cookies import SimpleCookie
+from urllib.parse import urlsplit
+
+from .loadgen import DEFAULT_HEADERS
+
+# Name of every scenario, in the order they run
+SCENARIOS = [
+    'collection', 'product_detail', 'api-product-list', 'manage_dresses', 'upload_dress',
+    'admin-products', 'admin-contact',
+]
+
+# Scenarios that need a staff session cookie. A few staff use the admin, so
+# these run one request at a time and measure page latency, not queueing.
+ADMIN_SCENARIOS = ['admin-products', 'admin-contact']
+
+# Name of every dress the upload scenario creates (see seed.mark_benchmark_uploads)
+UPLOAD_NAME_PREFIX = 'Bench upload '
+
+
+def get(url, headers=None):
+    request_headers = {**DEFAULT_HEADERS, **(headers or {})}
+
+    def make_request():
+        return urllib.request.Request(url, headers=request_headers)
+    return make_request
+
+
+def rotating_products(base_url, slugs):
+    """Spread product_detail load across the catalogue, not one hot page."""
+    def make_request():
+        return urllib.request.Request(
+            f'{base_url}/product/{random.choice(slugs)}/', headers=DEFAULT_HEADERS
+        )
+    return make_request
+
+
+def csrf_token(base_url, path):
+    """Fetch a page once to obtain a CSRF cookie for subsequent POSTs."""
+    request = urllib.request.Request(base_url + path, headers={'X-Forwarded-Proto': 'https'})
+    with urllib.request.urlopen(request) as response:
+        cookie = SimpleCookie()
+        for header in response.headers.get_all('Set-Cookie') or []:
+            cookie.load(header)
+    return cookie['csrftoken'].value
+
+
+def fake_jpeg():
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (300, 400), (201, 169, 98)).save(buffer, 'JPEG', quality=70)
+    return buffer.getvalue()
+
+
+def dress_upload(base_url):
+    """Multipart POSTs to the dashboard upload form, as a hidden 'Bench upload' dress."""
+    path = '/dashboard/upload-dress/'
+    token = csrf_token(base_url, path)
+    image = fake_jpeg()
+    host = urlsplit(base_url).netloc
+
+    def make_request():
+        boundary = uuid.uuid4().hex
+        fields = {'name': f'{UPLOAD_NAME_PREFIX}{uuid.uuid4().hex[:8]}', 'price': '100', 'dress_type': 'ankara'}
+        body = b''.join(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+            for name, value in fields.items()
+        )
+        body += (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="bench.jpg"\r\n'
+            'Content-Type: image/jpeg\r\n\r\n'
+        ).encode() + image + f'\r\n--{boundary}--\r\n'.encode()
+        return urllib.request.Request(base_url + path, data=body, method='POST', headers={
+            **DEFAULT_HEADERS,
+            'Content-Type': f'multipart/form-data; boundary={boundary}',
+            'Cookie': f'csrftoken={token}',
+            'X-CSRFToken': token,
+            # HTTPS requests must carry a same-origin Referer
+            'Referer': f'https://{host}{path}',
+        })
+    return make_request
+
+
+def build_scenarios(base_url, slugs, names=SCENARIOS, admin_cookie=None):
+    """
+    Map scenario name -> make_request callable for run_load().
+    Admin scenarios send `admin_cookie` (e.g. "sessionid=...") with each request.
+    """
+    admin_headers = {'Cookie': admin_cookie} if admin_cookie else {}
+    builders = {
+        'collection': lambda: get(base_url + '/collection/'),
+        'product_detail': lambda: rotating_products(base_url, slugs),
+        'api-product-list': lambda: get(base_url + '/api/products/'),
+        'manage_dresses': lambda: get(base_url + '/dashboard/manage-dresses/'),
+        'upload_dress': lambda: dress_upload(base_url),
+        'admin-products': lambda: get(base_url + '/admin/fashion/product/', admin_headers),
+        'admin-contact': lambda: get(base_url + '/admin/fashion/contactmessage/', admin_headers),
+    }
+    return {name: builders[name]() for name in names}
@@ -0,0 +1,177 @@
+import io
+import random
+from decimal import Decimal
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat
+
+from fashion.cache import bump_catalogue_generation
+from fashion.images import image_metadata, write_thumbnails
+from fashion.models import ContactMessage, Product
+
+from .scenarios import UPLOAD_NAME_PREFIX
+
+# Seeded rows are told apart by these markers, the only ones ever removed.
+# Product.save slugifies names and slugify never emits '--', so no product
+# created through the site carries the prefix; .invalid is a reserved TLD.
+SEED_SLUG_PREFIX = 'bench--'
+FAKE_IMAGE_COUNT = 8
+FAKE_IMAGE_DIR = 'products/bench'
+SEED_EMAIL_DOMAIN = 'bench.invalid'
+BENCH_ADMIN_USERNAME = 'bench-admin'
+
+COLOURS = [
+    (139, 69, 19), (201, 169, 98), (26, 26, 26), (180, 90, 60),
+    (240, 230, 210), (90, 60, 40), (120, 30, 50), (40, 80, 70),
+]
+
+
+def fake_images(count=FAKE_IMAGE_COUNT, size=(600, 800)):
+    """
+    Write `count` solid-colour JPEGs to media storage (once) and return their
+    names. Seeded products share them, so a 50k catalogue costs 8 files.
+    """
+    from PIL import Image
+
+    names = []
+    for index in range(count):
+        name = f'{FAKE_IMAGE_DIR}/fake-{index}.jpg'
+        if not default_storage.exists(name):
+            buffer = io.BytesIO()
+            Image.new('RGB', size, COLOURS[index % len(COLOURS)]).save(buffer, 'JPEG', quality=80)
+            name = default_storage.save(name, ContentFile(buffer.getvalue()))
+        names.append(name)
+    return names
+
+
+def seeded_products():
+    return Product.objects.filter(slug__startswith=SEED_SLUG_PREFIX)
+
+
+def seeded_messages():
+    return ContactMessage.objects.filter(email__endswith=f'@{SEED_EMAIL_DOMAIN}')
+
+
+def scratch_database_problem():
+    """
+    Why the database doesn't look like a scratch one, or None. Seeding and the
+    benchmarks bulk-insert and delete rows, so they refuse to run next to
+    products or messages they didn't create.
+    """
+    tables = connection.introspection.table_names()
+    for seeded in (seeded_products(), seeded_messages()):
+        model = seeded.model
+        if model._meta.db_table in tables and model.objects.exclude(pk__in=seeded.values('pk')).exists():
+            return (
+                f"{connection.settings_dict['NAME']} holds {model._meta.verbose_name_plural} "
+                f"that weren't seeded"
+            )
+    return None
+
+
+def mark_benchmark_uploads(since):
+    """Re-slug the dresses the upload scenario created since `since` as seeded ones."""
+    return Product.objects.filter(
+        name__startswith=UPLOAD_NAME_PREFIX, created_at__gte=since,
+    ).exclude(slug__startswith=SEED_SLUG_PREFIX).update(
+        slug=Concat(Value(f'{SEED_SLUG_PREFIX}upload-'), Cast('pk', CharField())),
+    )
+
+
+def clear_catalogue():
+    """
+    Delete every seeded product and contact message, plus files uploaded by
+    the upload benchmark (the shared fake images are kept). Returns the number
+    of products removed.
+    """
+    seeded_messages().delete()
+    seeded = seeded_products()
+    uploaded = seeded.exclude(image__startswith=f'{FAKE_IMAGE_DIR}/').exclude(image='')
+    for name in uploaded.values_list('image', flat=True):
+        if name:
+            default_storage.delete(name)
+    deleted, _ = seeded.delete()
+    return deleted
+
+
+def seed_catalogue(size, with_images=True, batch_size=1000, seed=42):
+    """
+    Replace the seeded catalogue with `size` synthetic products.
+    Rows are bulk-inserted with precomputed slugs, skipping the per-row slug
+    lookups in Product.save, so even 50k products seed in seconds.
+    """
+    rng = random.Random(seed)
+    clear_catalogue()
+    images = fake_images() if with_images else []
+    image_metas = {}
+    for name in images:
+        with default_storage.open(name) as file:
+            image_metas[name] = {**image_metadata(file), 'thumbnails': write_thumbnails(default_storage, name)}
+    categories = [choice for choice, _ in Product.CATEGORY_CHOICES]
+    dress_types = [choice for choice, _ in Product.DRESS_TYPE_CHOICES if choice]
+
+    batch = []
+    for index in range(size):
+        category = rng.choice(categories)
+        image = images[index % len(images)] if images else None
+        batch.append(Product(
+            name=f'Bench {category.title()} {index}',
+            slug=f'{SEED_SLUG_PREFIX}{index}',
+            category=category,
+            dress_type=rng.choice(dress_types) if category == 'dresses' else '',
+            description='Synthetic product seeded for benchmarking.',
+            price=Decimal(rng.randrange(5000, 250000)) / 100,
+            image=image,
+            image_meta=image_metas.get(image, {}),
+            is_available=rng.random() > 0.1,
+        ))
+        if len(batch) >= batch_size:
+            Product.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Product.objects.bulk_create(batch)
+
+    # bulk_create skips post_save, so invalidate cached pages by hand
+    bump_catalogue_generation()
+    return size
+
+
+def seed_inbox(size, batch_size=1000, seed=42):
+    """Replace the seeded contact messages with `size` synthetic ones, half of them read."""
+    rng = random.Random(seed)
+    seeded_messages().delete()
+    for start in range(0, size, batch_size):
+        ContactMessage.objects.bulk_create([
+            ContactMessage(
+                name=f'Bench Customer {index}',
+                email=f'customer{index}@{SEED_EMAIL_DOMAIN}',
+                message='Synthetic enquiry seeded for benchmarking. ' * rng.randint(1, 20),
+                is_read=rng.random() < 0.5,
+            )
+            for index in range(start, min(size, start + batch_size))
+        ])
+    return size
+
+
+def admin_session():
+    """Session key of a logged-in superuser, for loading admin pages."""
+    from importlib import import_module
+
+    from django.conf import settings
+    from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+
+    user, created = get_user_model().objects.get_or_create(
+        username=BENCH_ADMIN_USERNAME, defaults={'is_staff': True, 'is_superuser': True},
+    )
+    if created:
+        user.set_unusable_password()
+        user.save()
+    session = import_module(settings.SESSION_ENGINE).SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.create()
+    return session.session_key
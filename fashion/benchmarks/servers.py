@@ -0,0 +1,88 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+# gunicorn invocations for each serving mode
+SERVER_MODES = {
+    'wsgi': ['fashion_site.wsgi', '--worker-class', 'sync'],
+    'asgi': ['fashion_site.asgi', '--worker-class', 'uvicorn_worker.UvicornWorker'],
+    # The production profile; sizing comes from fashion_site/gunicorn_conf.py
+    'tuned': ['--config', 'python:fashion_site.gunicorn_conf'],
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def process_tree_rss_kb(pid):
+    """Resident memory of a process and all its descendants (Linux /proc only)."""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            status = Path(f'/proc/{current}/status').read_text()
+        except OSError:
+            continue
+        for line in status.splitlines():
+            if line.startswith('VmRSS:'):
+                total += int(line.split()[1])
+        for task in Path(f'/proc/{current}/task').glob('*'):
+            try:
+                pending.extend(int(child) for child in (task / 'children').read_text().split())
+            except OSError:
+                pass
+    return total
+
+
+@contextmanager
+def run_server(mode, workers=None, extra_args=None, env=None):
+    """
+    Start gunicorn in the given mode on a free port and yield (process, base_url).
+    `workers=None` keeps the mode's own default. The server is terminated when
+    the block exits.
+    """
+    port = free_port()
+    command = [
+        sys.executable, '-m', 'gunicorn', *SERVER_MODES[mode],
+        '--bind', f'127.0.0.1:{port}',
+        '--log-level', 'warning',
+        *(extra_args or []),
+    ]
+    if workers is not None:
+        command += ['--workers', str(workers)]
+    process = subprocess.Popen(
+        command,
+        cwd=settings.BASE_DIR,
+        env={**os.environ, **(env or {})},
+    )
+    try:
+        if not wait_for_port(port):
+            raise RuntimeError(f'{mode} server did not start on port {port}')
+        yield process, f'http://127.0.0.1:{port}'
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
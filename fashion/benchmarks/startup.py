@@ -0,0 +1,91 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+
+# What a fresh worker does before it can serve: load the app (settings,
+# INSTALLED_APPS, middleware) and the URLconf with every view module.
+BOOT_TARGETS = {
+    'wsgi': 'from django.core.wsgi import get_wsgi_application as get_application',
+    'asgi': 'from django.core.asgi import get_asgi_application as get_application',
+}
+
+BOOT_TEMPLATE = '''
+{import_line}
+application = get_application()
+from django.urls import resolve
+resolve('/')
+'''
+
+# Cold boot of one worker must stay under this (milliseconds, median)
+STARTUP_BUDGET_MS = 1000
+
+
+def boot_command(target, importtime=False):
+    code = BOOT_TEMPLATE.format(import_line=BOOT_TARGETS[target])
+    return [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', code]
+
+
+def boot_env():
+    return {
+        **os.environ,
+        'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'fashion_site.settings'),
+    }
+
+
+def cold_start_times(target='wsgi', repeat=7):
+    """Wall-clock milliseconds of `repeat` fresh interpreters booting the app."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run(
+            boot_command(target), cwd=settings.BASE_DIR, env=boot_env(), check=True,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        times.append((time.perf_counter() - started) * 1000)
+    return times
+
+
+def summarize_times(times):
+    return {
+        'runs': len(times),
+        'median_ms': round(statistics.median(times), 1),
+        'min_ms': round(min(times), 1),
+        'max_ms': round(max(times), 1),
+    }
+
+
+def import_profile(target='wsgi'):
+    """
+    Boot once under `python -X importtime` and return one dict per imported
+    module: name, self and cumulative time in milliseconds, nesting depth.
+    """
+    result = subprocess.run(
+        boot_command(target, importtime=True), cwd=settings.BASE_DIR, env=boot_env(),
+        check=True, capture_output=True, text=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        # "import time:       449 |     281052 |   django.core.wsgi"
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        modules.append({
+            'module': name.strip(),
+            'self_ms': int(self_us) / 1000,
+            'cumulative_ms': int(cumulative_us) / 1000,
+            'depth': (len(name) - len(name.lstrip())) // 2,
+        })
+    return modules
+
+
+def by_package(modules):
+    """Total self time per top-level package, slowest first."""
+    totals = {}
+    for module in modules:
+        package = module['module'].split('.')[0]
+        totals[package] = totals.get(package, 0) + module['self_ms']
+    return sorted(((name, round(ms, 1)) for name, ms in totals.items()), key=lambda item: -item[1])
@@ -0,0 +1,49 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .profiling import record_cache
+
+CATALOGUE_GENERATION_KEY = 'fashion:catalogue-generation'
+
+
+def get_catalogue_generation():
+    """Return the current catalogue generation (bumped on every edit)."""
+    generation = cache.get(CATALOGUE_GENERATION_KEY)
+    if generation is None:
+        # Seeded from the clock, not 1: if the key was evicted, numbers handed
+        # out before must not come back while pages cached under them live on
+        generation = time.time_ns()
+        if not cache.add(CATALOGUE_GENERATION_KEY, generation, timeout=None):
+            generation = cache.get(CATALOGUE_GENERATION_KEY, generation)
+    return generation
+
+
+def bump_catalogue_generation():
+    """Invalidate every cached page by moving to a new generation."""
+    try:
+        return cache.incr(CATALOGUE_GENERATION_KEY)
+    except ValueError:
+        generation = time.time_ns()
+        cache.set(CATALOGUE_GENERATION_KEY, generation, timeout=None)
+        return generation
+
+
+def page_cache_key(path, query_string=''):
+    """Cache key for a rendered storefront page in the current generation."""
+    generation = get_catalogue_generation()
+    key = f"fashion:page:{generation}:{path}"
+    if query_string:
+        key = f"{key}?{query_string}"
+    return key
+
+
+def get_cached_page(path, query_string=''):
+    entry = cache.get(page_cache_key(path, query_string))
+    record_cache(entry is not None)
+    return entry
+
+
+def set_cached_page(path, query_string, entry):
+    cache.set(page_cache_key(path, query_string), entry, settings.PAGE_CACHE_TIMEOUT)
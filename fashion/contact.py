@@ -0,0 +1,118 @@
+"""
+Contact form ingestion.
+
+Messages are fingerprinted to drop resubmitted spam, then buffered in memory
+and written with bulk_create once CONTACT_BATCH_SIZE messages are waiting or
+CONTACT_FLUSH_INTERVAL seconds after the first one arrived, so a burst of
+submissions costs a handful of INSERTs instead of one per POST.
+"""
+
+import atexit
+import hashlib
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+from .models import ContactMessage
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_KEY_PREFIX = 'fashion:contact-fingerprint'
+
+
+def fingerprint(email, message):
+    """Hash of the sender and text, insensitive to case and whitespace."""
+    normalized = f"{email.strip().lower()}\n{' '.join(message.lower().split())}"
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def fingerprint_key(email, message):
+    return f'{FINGERPRINT_KEY_PREFIX}:{fingerprint(email, message)}'
+
+
+def is_duplicate(email, message):
+    """
+    True if the same message was accepted within CONTACT_DEDUP_SECONDS.
+    cache.add is atomic on every backend, so concurrent copies count too.
+    """
+    return not cache.add(fingerprint_key(email, message), 1, timeout=settings.CONTACT_DEDUP_SECONDS)
+
+
+def forget(message):
+    """Let a message that was never saved be sent again."""
+    cache.delete(fingerprint_key(message.email, message.message))
+
+
+class ContactBuffer:
+    """Thread-safe in-process buffer of unsaved ContactMessages."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = []
+        self._timer = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, message):
+        with self._lock:
+            self._pending.append(message)
+            full = len(self._pending) >= settings.CONTACT_BATCH_SIZE
+            if not full and self._timer is None:
+                self._timer = threading.Timer(settings.CONTACT_FLUSH_INTERVAL, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write every buffered message; returns how many were saved."""
+        with self._lock:
+            batch, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not batch:
+            return 0
+        try:
+            ContactMessage.objects.bulk_create(batch)
+            return len(batch)
+        except Exception:
+            logger.exception('Bulk insert of %d contact message(s) failed, saving them one by one', len(batch))
+        # One bad row (or a dropped connection) shouldn't lose the whole batch
+        close_old_connections()
+        saved = 0
+        for message in batch:
+            message.pk = None
+            try:
+                message.save(force_insert=True)
+                saved += 1
+            except Exception:
+                logger.exception('Dropped contact message from %s', message.email)
+                forget(message)
+        return saved
+
+    def _flush_from_timer(self):
+        # Timer threads get their own DB connection; don't leak it
+        try:
+            self.flush()
+        finally:
+            close_old_connections()
+
+
+contact_buffer = ContactBuffer()
+atexit.register(contact_buffer.flush)
+
+
+def enqueue_contact_message(name, email, message):
+    """
+    Accept a validated contact submission. Returns False if it was dropped
+    as a duplicate, True once it is buffered for the next batch insert.
+    """
+    if is_duplicate(email, message):
+        return False
+    contact_buffer.add(ContactMessage(name=name, email=email, message=message))
+    return True
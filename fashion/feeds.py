@@ -0,0 +1,324 @@
+"""
+sitemap.xml and the product feed, streamed from the database and kept on disk.
+
+Django's sitemap framework builds every page in memory on each request.
+Here the catalogue is read FEED_CHUNK_SIZE rows at a time through values()
+projections and written to a file in FEED_CACHE_DIR, which is then served.
+Later requests are served from that file until an edit moves the catalogue
+generation on, so crawlers never cause a full-table render of their own.
+One request (in any worker) builds a file under its flock; requests missing
+meanwhile get the previous generation's copy, or a 503 with Retry-After
+when there is none, rather than waiting. Files of older generations are
+removed once a newer one is complete.
+
+Absolute URLs always use SITE_URL, never the request's Host, so there is one
+cached copy of each file however the site is reached.
+
+/sitemap.xml is an index of /sitemap-<n>.xml pages of at most
+SITEMAP_MAX_URLS URLs each (the sitemap protocol allows 50,000).
+"""
+
+import contextlib
+import email.utils
+import json
+import os
+import re
+import shutil
+import threading
+import zlib
+from urllib.parse import urljoin
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+from .cache import get_catalogue_generation
+from .models import Product
+
+# Coalesces builds between workers; without it every miss builds its own copy
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Pages listed before the products on the first sitemap page
+SITEMAP_URL_NAMES = ['home', 'collection', 'about', 'contact']
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+# Google Merchant Center's namespace, also read by other marketplaces
+MERCHANT_NS = 'http://base.google.com/ns/1.0'
+
+FEED_TITLE = 'DOMEMILY'
+FEED_DESCRIPTION = 'African Luxury Fashion'
+
+FEED_CONTENT_TYPES = {
+    'json': 'application/json',
+    'xml': 'application/xml; charset=utf-8',
+}
+SITEMAP_CONTENT_TYPE = 'application/xml; charset=utf-8'
+
+# Bytes per block written
+BLOCK_SIZE = 64 * 1024
+
+# Retry-After of a miss while the first copy of a file is being built
+FEED_RETRY_AFTER = 5
+
+# Characters XML 1.0 doesn't allow, even escaped
+INVALID_XML_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def xml_text(value):
+    return escape(INVALID_XML_RE.sub('', str(value)))
+
+
+def lastmod(timestamp):
+    return timestamp.isoformat(timespec='seconds')
+
+
+def available_products():
+    # Oldest first, so new products only ever change the last sitemap page
+    return Product.objects.filter(is_available=True).order_by('pk')
+
+
+def sitemap_index(base_url):
+    """
+    <sitemapindex> of every sitemap page, each with the newest <lastmod> of
+    its products. Reads only the timestamps.
+    """
+    per_page = settings.SITEMAP_MAX_URLS
+    newest = [None]
+    position = len(SITEMAP_URL_NAMES)
+    timestamps = available_products().values_list('updated_at', flat=True)
+    for updated_at in timestamps.iterator(chunk_size=settings.FEED_CHUNK_SIZE):
+        page = position // per_page
+        if page == len(newest):
+            newest.append(updated_at)
+        elif newest[page] is None or updated_at > newest[page]:
+            newest[page] = updated_at
+        position += 1
+
+    yield f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{SITEMAP_NS}">\n'
+    for page, updated_at in enumerate(newest, start=1):
+        entry = f"<sitemap><loc>{xml_text(base_url + reverse('sitemap_page', args=[page]))}</loc>"
+        if updated_at is not None:
+            entry += f'<lastmod>{lastmod(updated_at)}</lastmod>'
+        yield entry + '</sitemap>\n'
+    yield '</sitemapindex>\n'
+
+
+def sitemap_page_bounds(page):
+    """Slice of available_products() on sitemap page `page` (1-based)."""
+    per_page = settings.SITEMAP_MAX_URLS
+    start = max(0, (page - 1) * per_page - len(SITEMAP_URL_NAMES))
+    return start, page * per_page - len(SITEMAP_URL_NAMES)
+
+
+def sitemap_page_count():
+    total = len(SITEMAP_URL_NAMES) + available_products().count()
+    return -(-total // settings.SITEMAP_MAX_URLS)
+
+
+def feed_paths():
+    """The sitemap index, every sitemap page and both product feeds."""
+    return [
+        reverse('sitemap'),
+        *(reverse('sitemap_page', args=[page]) for page in range(1, sitemap_page_count() + 1)),
+        reverse('product_feed_json'),
+        reverse('product_feed_xml'),
+    ]
+
+
+def sitemap_page_exists(page):
+    if page == 1:
+        return True
+    start, _ = sitemap_page_bounds(page)
+    return available_products()[start:start + 1].exists()
+
+
+def sitemap_urlset(base_url, page):
+    """<urlset> of sitemap page `page`: the SITEMAP_URL_NAMES pages first, then products."""
+    yield f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">\n'
+    if page == 1:
+        for name in SITEMAP_URL_NAMES:
+            yield f'<url><loc>{xml_text(base_url + reverse(name))}</loc></url>\n'
+    start, end = sitemap_page_bounds(page)
+    products = available_products()[start:end].values('slug', 'updated_at')
+    for product in products.iterator(chunk_size=settings.FEED_CHUNK_SIZE):
+        loc = base_url + reverse('product_detail', args=[product['slug']])
+        yield f"<url><loc>{xml_text(loc)}</loc><lastmod>{lastmod(product['updated_at'])}</lastmod></url>\n"
+    yield '</urlset>\n'
+
+
+def feed_items(base_url):
+    """Every available product as a dict of the fields marketplaces ask for."""
+    categories = dict(Product.CATEGORY_CHOICES)
+    products = available_products().values(
+        'pk', 'slug', 'name', 'description', 'price', 'category', 'image', 'image_url', 'updated_at',
+    )
+    for product in products.iterator(chunk_size=settings.FEED_CHUNK_SIZE):
+        if product['image_url']:
+            image = product['image_url']
+        elif product['image']:
+            image = urljoin(base_url + '/', default_storage.url(product['image']))
+        else:
+            image = ''
+        yield {
+            'id': str(product['pk']),
+            'title': product['name'],
+            'description': product['description'],
+            'link': base_url + reverse('product_detail', args=[product['slug']]),
+            'image_link': image,
+            'price': f"{product['price']} {settings.FEED_CURRENCY}",
+            'availability': 'in stock',
+            'product_type': categories.get(product['category'], product['category']),
+            'updated': product['updated_at'],
+        }
+
+
+def product_feed_json(base_url):
+    yield f'{{"title": {json.dumps(FEED_TITLE)}, "link": {json.dumps(base_url + "/")}, "products": ['
+    separator = '\n'
+    for item in feed_items(base_url):
+        item['updated'] = lastmod(item['updated'])
+        yield separator + json.dumps(item, ensure_ascii=False)
+        separator = ',\n'
+    yield '\n]}\n'
+
+
+def product_feed_xml(base_url):
+    """RSS 2.0 with Merchant Center <g:*> fields."""
+    yield (
+        f'<?xml version="1.0" encoding="UTF-8"?>\n<rss version="2.0" xmlns:g="{MERCHANT_NS}"><channel>\n'
+        f'<title>{xml_text(FEED_TITLE)}</title><link>{xml_text(base_url + "/")}</link>'
+        f'<description>{xml_text(FEED_DESCRIPTION)}</description>\n'
+    )
+    for item in feed_items(base_url):
+        entry = (
+            f"<item><g:id>{item['id']}</g:id><title>{xml_text(item['title'])}</title>"
+            f"<description>{xml_text(item['description'])}</description>"
+            f"<link>{xml_text(item['link'])}</link>"
+        )
+        if item['image_link']:
+            entry += f"<g:image_link>{xml_text(item['image_link'])}</g:image_link>"
+        entry += (
+            f"<g:price>{item['price']}</g:price><g:availability>{item['availability']}</g:availability>"
+            f"<g:condition>new</g:condition><g:brand>{xml_text(FEED_TITLE)}</g:brand>"
+            f"<g:product_type>{xml_text(item['product_type'])}</g:product_type>"
+            f"<pubDate>{email.utils.format_datetime(item['updated'])}</pubDate></item>\n"
+        )
+        yield entry
+    yield '</channel></rss>\n'
+
+
+PRODUCT_FEEDS = {
+    'json': product_feed_json,
+    'xml': product_feed_xml,
+}
+
+
+def site_url():
+    """Origin of every absolute URL in the feeds."""
+    return settings.SITE_URL or f'https://{settings.PRERENDER_HOST}'
+
+
+def feed_cache_path(name):
+    """Cached file of `name` in the current generation."""
+    return os.path.join(settings.FEED_CACHE_DIR, str(get_catalogue_generation()), name)
+
+
+def open_cached(path, gzipped):
+    """The cached file (or its .gz), or None before it has been written."""
+    with contextlib.suppress(FileNotFoundError):
+        return open(f'{path}.gz' if gzipped else path, 'rb')
+    return None
+
+
+def remove_old_generations(current):
+    with contextlib.suppress(FileNotFoundError):
+        for entry in os.scandir(settings.FEED_CACHE_DIR):
+            if entry.is_dir() and entry.name != current:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def blocks_of(chunks):
+    """Join `chunks` (str) into encoded blocks of about BLOCK_SIZE bytes."""
+    buffer, size = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= BLOCK_SIZE:
+            yield ''.join(buffer).encode()
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer).encode()
+
+
+def write_feed(chunks, path, gzipped):
+    """
+    Write `chunks` to `path` and `path`.gz through temp files renamed into
+    place, so readers never see half a file. Returns the new file (its .gz
+    if `gzipped`) open for reading.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    # wbits=31: gzip framing, so the .gz file can be served as is
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    try:
+        with open(tmp, 'wb') as plain, open(f'{tmp}.gz', 'wb') as compressed:
+            for block in blocks_of(chunks):
+                plain.write(block)
+                compressed.write(compressor.compress(block))
+            compressed.write(compressor.flush())
+        # Opened first: still readable if the generation moves on and its directory goes
+        file = open(f'{tmp}.gz' if gzipped else tmp, 'rb')
+        with contextlib.suppress(FileNotFoundError):
+            os.replace(f'{tmp}.gz', f'{path}.gz')
+            os.replace(tmp, path)
+    finally:
+        for leftover in (tmp, f'{tmp}.gz'):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(leftover)
+    remove_old_generations(str(get_catalogue_generation()))
+    return file
+
+
+def open_previous(name, gzipped):
+    """The newest copy of `name` from an older generation, or None."""
+    current = str(get_catalogue_generation())
+    with contextlib.suppress(FileNotFoundError):
+        generations = [
+            entry.name for entry in os.scandir(settings.FEED_CACHE_DIR)
+            if entry.is_dir() and entry.name != current and entry.name.isdigit()
+        ]
+        for generation in sorted(generations, key=int, reverse=True):
+            file = open_cached(os.path.join(settings.FEED_CACHE_DIR, generation, name), gzipped)
+            if file is not None:
+                return file
+    return None
+
+
+def open_or_build(path, gzipped, chunks):
+    """
+    (file, status) of the feed cached at `path`. Status is 'hit' when it's
+    on disk, 'miss' when this request built it from chunks() (under the
+    build lock, released before returning), or 'stale' for the previous
+    generation's copy while another request builds this one. Without a
+    previous copy that is (None, 'building'): nobody waits for a build.
+    """
+    file = open_cached(path, gzipped)
+    if file is not None:
+        return file, 'hit'
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f'{path}.lock', 'a') as lock:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                file = open_previous(os.path.basename(path), gzipped)
+                return (file, 'stale') if file is not None else (None, 'building')
+        # Another request may have finished it just before we got the lock
+        file = open_cached(path, gzipped)
+        if file is not None:
+            return file, 'hit'
+        return write_feed(chunks(), path, gzipped), 'miss'
@@ -0,0 +1,365 @@
+"""
+Resized product images on demand: /img/<product_id>/<width>.<fmt>.
+
+Each variant is rendered with Pillow the first time it's asked for and kept
+in a size-bounded disk cache (IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES) shared
+by the workers of a host. Least recently used files are evicted first; hits
+touch a file's mtime to mark it used. Remote originals (Cloudinary or any
+image_url) are cached the same way, so new widths don't refetch them.
+
+Concurrent requests for the same variant are coalesced: inside a process
+only the first one renders and the others wait for its result, and across
+processes a striped flock makes the rest find the file already written.
+"""
+
+import contextlib
+import hashlib
+import io
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+
+from .cache import get_catalogue_generation
+from .images import RESIZE_FORMATS, resize_image
+from .metrics import registry
+from .models import Product
+
+# Host-wide locks for eviction and renders (no-ops where flock doesn't exist)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# `auto` picks the best format the client accepts
+AUTO_FORMAT = 'auto'
+
+# Eviction trims the cache to this share of its limit, so it doesn't run on every write
+EVICT_TO = 0.9
+
+# Bytes stored in the cache directory, shared by every worker
+SIZE_FILE = '.size'
+
+# Number of lock files coalescing renders across processes
+LOCK_STRIPES = 64
+
+SOURCE_KEY_PREFIX = 'fashion:image-source'
+
+
+def negotiate_format(accept):
+    """Pick the image format for an `auto` request from its Accept header."""
+    for item in accept.split(','):
+        media_type, _, params = item.strip().partition(';')
+        if media_type.strip().lower() != 'image/webp':
+            continue
+        params = params.strip()
+        try:
+            quality = float(params[2:]) if params.startswith('q=') else 1.0
+        except ValueError:
+            quality = 0.0
+        if quality > 0:
+            return 'webp'
+    return 'jpg'
+
+
+def image_source(product_id):
+    """
+    Display URL and stored file name of a product's image, or None. Cached
+    per catalogue generation, so warm requests run no queries.
+    """
+    key = f'{SOURCE_KEY_PREFIX}:{get_catalogue_generation()}:{product_id}'
+    source = cache.get(key)
+    if source is None:
+        product = Product.objects.filter(pk=product_id).only('image', 'image_url').first()
+        url = product.get_image_display_url() if product else ''
+        source = {'url': url, 'name': product.image.name if product and product.image and not product.image_url else ''}
+        cache.set(key, source, settings.PAGE_CACHE_TIMEOUT)
+    return source if source['url'] else None
+
+
+class DiskLRUCache:
+    """
+    Files under `directory`, evicted least recently used first past `max_bytes`.
+
+    The bytes stored are kept in a size file that every worker updates under
+    the eviction lock, so the limit holds for the host and not per process.
+    Eviction re-counts the files, correcting any drift (removed sources,
+    overwritten keys).
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def open(self, key, kind='variant'):
+        """
+        An open file for `key` (which survives a concurrent eviction), or
+        None. Counted as a hit or miss of `kind` unless `kind` is None.
+        """
+        path = self.path(key)
+        try:
+            file = open(path, 'rb')
+        except FileNotFoundError:
+            if kind:
+                self.misses += 1
+                registry.inc('fashion_image_cache_misses_total', kind=kind)
+            return None
+        # mtime is the recency the eviction goes by
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        if kind:
+            self.hits += 1
+            registry.inc('fashion_image_cache_hits_total', kind=kind)
+        return file
+
+    def put(self, key, data):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as file:
+            file.write(data)
+        os.replace(tmp, path)
+        with self._locked():
+            size = self._read_size()
+            if size is None:
+                # First write (or a lost size file): count what's there, this file included
+                size = self.total_bytes()
+            else:
+                size += len(data)
+            if size > self.max_bytes:
+                self._evict()
+            else:
+                self._write_size(size)
+
+    def remove(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def entries(self):
+        """(mtime, size, path) of every cached file."""
+        entries = []
+        try:
+            shards = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return entries
+        for shard in shards:
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def total_bytes(self):
+        return sum(size for _, size, _ in self.entries())
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Hold the host-wide lock guarding the size file and eviction."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, '.evict.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _read_size(self):
+        try:
+            with open(os.path.join(self.directory, SIZE_FILE)) as file:
+                return int(file.read())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_size(self, size):
+        with open(os.path.join(self.directory, SIZE_FILE), 'w') as file:
+            file.write(str(size))
+
+    def evict(self):
+        """Delete the least recently used files until the cache fits EVICT_TO of its limit."""
+        with self._locked():
+            return self._evict()
+
+    def _evict(self):
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICT_TO
+        evicted = evicted_bytes = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+            evicted_bytes += size
+        self._write_size(total)
+        with self._lock:
+            self.evictions += evicted
+            self.evicted_bytes += evicted_bytes
+        if evicted:
+            registry.inc('fashion_image_cache_evictions_total', evicted)
+            registry.inc('fashion_image_cache_evicted_bytes_total', evicted_bytes)
+        return evicted
+
+    def stats(self):
+        entries = self.entries()
+        return {
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'evicted_bytes': self.evicted_bytes,
+        }
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Coalescer:
+    """Runs one call per key at a time; callers arriving meanwhile share its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0
+
+    def do(self, key, function):
+        """Returns (result, shared), shared being True for callers that waited."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+        if not leader:
+            registry.inc('fashion_image_coalesced_total')
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = function()
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+def variant_key(source_url, width, fmt):
+    return hashlib.sha256(f'{source_url}|{width}|{fmt}'.encode()).hexdigest()[:40] + f'.{fmt}'
+
+
+def source_key(source_url):
+    return hashlib.sha256(source_url.encode()).hexdigest()[:40] + '.src'
+
+
+class ImageProxy:
+    """Renders, caches and coalesces resized variants of product images."""
+
+    def __init__(self):
+        self._cache = None
+        self._cache_lock = threading.Lock()
+        self.coalescer = Coalescer()
+
+    @property
+    def cache(self):
+        with self._cache_lock:
+            if self._cache is None or self._cache.directory != str(settings.IMAGE_CACHE_DIR):
+                self._cache = DiskLRUCache(settings.IMAGE_CACHE_DIR, settings.IMAGE_CACHE_MAX_BYTES)
+            return self._cache
+
+    def variant(self, source, width, fmt):
+        """
+        (open file, status) of `source` at `width` as `fmt`; status is 'hit',
+        'miss' or 'coalesced'. Raises OSError/ValueError if the origin can't
+        be fetched or decoded.
+        """
+        key = variant_key(source['url'], width, fmt)
+        file = self.cache.open(key)
+        if file is not None:
+            return file, 'hit'
+        _, shared = self.coalescer.do(key, lambda: self._render(key, source, width, fmt))
+        file = self.cache.open(key, kind=None)
+        if file is None:
+            # Evicted between rendering and reading: only under extreme pressure
+            file = io.BytesIO(self._resize(source, width, fmt))
+        return file, 'coalesced' if shared else 'miss'
+
+    def _render(self, key, source, width, fmt):
+        stripe = int(key[:8], 16) % LOCK_STRIPES
+        os.makedirs(self.cache.directory, exist_ok=True)
+        with open(os.path.join(self.cache.directory, f'.render-{stripe:02d}.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Another worker may have rendered it while we waited
+            if os.path.exists(self.cache.path(key)):
+                return
+            started = time.perf_counter()
+            data = self._resize(source, width, fmt)
+            registry.observe('fashion_image_resize_duration_seconds', time.perf_counter() - started)
+            self.cache.put(key, data)
+
+    def _resize(self, source, width, fmt):
+        try:
+            with self._open_source(source) as file:
+                return resize_image(file, width, fmt)
+        except (OSError, ValueError):
+            # Refetch a bad remote original next time instead of keeping it
+            if not source['name']:
+                self.cache.remove(source_key(source['url']))
+            raise
+
+    def _open_source(self, source):
+        if source['name']:
+            return default_storage.open(source['name'])
+        key = source_key(source['url'])
+        file = self.cache.open(key, kind='source')
+        if file is None:
+            import urllib.request
+
+            with urllib.request.urlopen(source['url'], timeout=settings.IMAGE_PROXY_TIMEOUT) as response:
+                data = response.read(settings.IMAGE_PROXY_MAX_SOURCE_BYTES + 1)
+            if len(data) > settings.IMAGE_PROXY_MAX_SOURCE_BYTES:
+                raise ValueError(f"{source['url']} is larger than IMAGE_PROXY_MAX_SOURCE_BYTES")
+            self.cache.put(key, data)
+            file = io.BytesIO(data)
+        return file
+
+
+image_proxy = ImageProxy()
+
+
+def content_type(fmt):
+    return RESIZE_FORMATS[fmt][1]
@@ -0,0 +1,194 @@
+import base64
+import hashlib
+import io
+import logging
+import os
+import warnings
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+
+logger = logging.getLogger(__name__)
+
+CLOUDINARY_UPLOAD_SEGMENT = '/image/upload/'
+THUMBNAIL_DIR = 'thumbs'
+# Admin changelist preview and change form image, both at 2x
+THUMBNAIL_SIZES = [(100, 130), (600, 800)]
+
+# Longest side of the inline placeholder; the browser scales it up smoothly
+PLACEHOLDER_SIZE = 16
+
+
+def open_pillow_image(file):
+    """
+    Image.open() that refuses images over IMAGE_MAX_PIXELS from their header,
+    before any pixel data is decoded. Pillow itself only warns up to twice its
+    MAX_IMAGE_PIXELS and then raises DecompressionBombError, which isn't an
+    OSError; both end up as ValueError here.
+    """
+    from PIL import Image
+
+    Image.MAX_IMAGE_PIXELS = settings.IMAGE_MAX_PIXELS
+    # Its warning is redundant: every image it is raised for is refused below
+    warnings.filterwarnings('ignore', category=Image.DecompressionBombWarning)
+    try:
+        image = Image.open(file)
+    except Image.DecompressionBombError as error:
+        raise ValueError(str(error)) from error
+    if image.width * image.height > settings.IMAGE_MAX_PIXELS:
+        image.close()
+        raise ValueError(f'{image.width}x{image.height} image is larger than IMAGE_MAX_PIXELS')
+    return image
+
+
+def cloudinary_thumbnail_url(url, width, height):
+    """Ask Cloudinary for a cropped, auto-format derivative of `url`."""
+    transformation = f'c_fill,g_auto,w_{width},h_{height},q_auto,f_auto/'
+    return url.replace(CLOUDINARY_UPLOAD_SEGMENT, CLOUDINARY_UPLOAD_SEGMENT + transformation, 1)
+
+
+def thumbnail_name(name, width, height):
+    stem, _ = os.path.splitext(name)
+    return f'{THUMBNAIL_DIR}/{width}x{height}/{stem}.jpg'
+
+
+def write_thumbnails(storage, name, sizes=THUMBNAIL_SIZES):
+    """
+    Write a width x height JPEG crop of the stored image `name` for each of
+    `sizes`, next to the media files. Returns the sizes written as 'WxH', to
+    keep in image_meta['thumbnails'] so pages never look for them on disk.
+    """
+    from PIL import ImageOps
+
+    try:
+        with storage.open(name) as source, open_pillow_image(source) as original:
+            original = original.convert('RGB')
+            crops = {(width, height): ImageOps.fit(original, (width, height)) for width, height in sizes}
+    except (OSError, ValueError):
+        logger.warning('Could not build thumbnails of %s', name)
+        return []
+    written = []
+    for (width, height), crop in crops.items():
+        buffer = io.BytesIO()
+        crop.save(buffer, 'JPEG', quality=80, optimize=True)
+        # Same name on every rebuild: replace, don't get a suffixed copy
+        path = thumbnail_name(name, width, height)
+        storage.delete(path)
+        storage.save(path, ContentFile(buffer.getvalue()))
+        written.append(f'{width}x{height}')
+    return written
+
+
+def thumbnail_url(url, image, width, height, meta=None):
+    """
+    Thumbnail of an image given as a display URL plus (optionally) its
+    ImageField and image_meta. Cloudinary images are resized by Cloudinary,
+    local files use the crop written on upload (see write_thumbnails) if
+    there is one; anything else is returned as is.
+    """
+    if url and CLOUDINARY_UPLOAD_SEGMENT in url:
+        return cloudinary_thumbnail_url(url, width, height)
+    if (image and isinstance(image.storage, FileSystemStorage) and url == image.url
+            and f'{width}x{height}' in (meta or {}).get('thumbnails', ())):
+        return image.storage.url(thumbnail_name(image.name, width, height))
+    return url
+
+
+def image_metadata(file):
+    """
+    Intrinsic width/height, dominant colour and a tiny inline placeholder
+    (a ~150 byte WebP data URI) of an uploaded or stored image file.
+    Returns {} if the file can't be read as an image.
+    """
+    from PIL import ImageOps, features
+
+    try:
+        file.seek(0)
+        with open_pillow_image(file) as original:
+            image = ImageOps.exif_transpose(original).convert('RGB')
+    except (OSError, ValueError):
+        logger.warning('Could not read image metadata of %s', getattr(file, 'name', file))
+        return {}
+    finally:
+        # Leave the file ready for the upload that follows
+        file.seek(0)
+
+    width, height = image.size
+    image.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    # Most common colour of a 5-colour palette of the tiny image
+    palette = image.quantize(colors=5)
+    _, index = max(palette.getcolors())
+    red, green, blue = palette.getpalette()[index * 3:index * 3 + 3]
+
+    fmt, mime = ('WEBP', 'image/webp') if features.check('webp') else ('PNG', 'image/png')
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, quality=40)
+    return {
+        'width': width,
+        'height': height,
+        'color': f'#{red:02x}{green:02x}{blue:02x}',
+        'placeholder': f'data:{mime};base64,{base64.b64encode(buffer.getvalue()).decode()}',
+    }
+
+
+def placeholder_style(meta):
+    """Inline CSS painting the placeholder behind an image while it loads."""
+    if not meta:
+        return ''
+    style = f"background-color: {meta['color']};"
+    if meta.get('placeholder'):
+        style += f" background-image: url({meta['placeholder']}); background-size: cover; background-position: center;"
+    return style
+
+
+def image_version(url):
+    """Short hash of an image's display URL, which changes whenever the image is replaced."""
+    return hashlib.sha256(url.encode()).hexdigest()[:10]
+
+
+def open_image(url, image, timeout=30):
+    """
+    A readable file for an image given as a display URL plus (optionally)
+    its ImageField: the stored file when the URL points at it, otherwise the
+    bytes downloaded from the URL (e.g. Cloudinary).
+    """
+    if image and (not url or url == image.url):
+        return image.storage.open(image.name)
+    import urllib.request
+
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return io.BytesIO(response.read())
+
+
+# URL extension -> (Pillow format, content type) of resized variants
+RESIZE_FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpg': ('JPEG', 'image/jpeg'),
+    'png': ('PNG', 'image/png'),
+}
+
+
+def resize_image(file, width, fmt):
+    """
+    Bytes of the image in `file` scaled down to `width` pixels wide (never
+    up) and encoded as `fmt`, a key of RESIZE_FORMATS. Raises OSError or
+    ValueError if the file isn't a readable image or is over IMAGE_MAX_PIXELS.
+    """
+    from PIL import Image, ImageOps
+
+    pil_format, _ = RESIZE_FORMATS[fmt]
+    with open_pillow_image(file) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.width > width:
+            image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha and pil_format != 'JPEG' else 'RGB')
+        buffer = io.BytesIO()
+        if pil_format == 'JPEG':
+            image.save(buffer, pil_format, quality=82, optimize=True, progressive=True)
+        elif pil_format == 'WEBP':
+            image.save(buffer, pil_format, quality=80, method=4)
+        else:
+            image.save(buffer, pil_format, optimize=True)
+    return buffer.getvalue()
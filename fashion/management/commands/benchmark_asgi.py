@@ -0,0 +1,57 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from fashion.benchmarks.loadgen import run_load, slow_clients
+from fashion.benchmarks.servers import process_tree_rss_kb, run_server
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare concurrent-request capacity of the sync WSGI and the ASGI "
+        "(uvicorn worker) deployments with the same number of worker processes. "
+        "Slow clients trickling uploads are mixed in to show worker pinning."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/collection/', help='URL path to load.')
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes for both modes.')
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds per run.')
+        parser.add_argument('--slow-clients', type=int, default=4,
+                            help='Connections trickling a POST body to /api/contact/.')
+        parser.add_argument('--modes', nargs='+', default=['wsgi', 'asgi'], choices=['wsgi', 'asgi'])
+        parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+
+    def handle(self, *args, **options):
+        results = {}
+        for mode in options['modes']:
+            with run_server(mode, workers=options['workers']) as (process, base_url):
+                # Warm the worker(s) so imports and the page cache don't skew the run
+                run_load(base_url + options['path'], concurrency=1, duration=1.0)
+                if options['slow_clients']:
+                    slow_clients(base_url + '/api/contact/', options['slow_clients'],
+                                 options['duration'] + 2)
+                    time.sleep(0.5)
+                stats = run_load(base_url + options['path'],
+                                 concurrency=options['concurrency'],
+                                 duration=options['duration'],
+                                 timeout=options['duration'])
+                stats['rss_mb'] = round(process_tree_rss_kb(process.pid) / 1024, 1)
+                results[mode] = stats
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(
+            f"{options['workers']} worker(s), {options['concurrency']} concurrent clients, "
+            f"{options['slow_clients']} slow uploads, {options['path']}"
+        )
+        self.stdout.write(f"{'mode':<6}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}{'RSS MB':>9}")
+        for mode, stats in results.items():
+            self.stdout.write(
+                f"{mode:<6}{stats['throughput_rps']:>10}{stats['p50_ms']:>10}"
+                f"{stats['p99_ms']:>10}{stats['errors']:>8}{stats['rss_mb']:>9}"
+            )
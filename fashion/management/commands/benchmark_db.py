@@ -0,0 +1,90 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from fashion.benchmarks.loadgen import summarize
+
+# Connection strategies compared, expressed as the env overrides settings.py reads
+STRATEGIES = {
+    'per-request': {'DB_POOL': 'False', 'DB_CONN_MAX_AGE': '0'},
+    'persistent': {'DB_POOL': 'False', 'DB_CONN_MAX_AGE': '600'},
+    'pooled': {'DB_POOL': 'True', 'DB_CONN_MAX_AGE': '0'},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure how much connection setup adds to request latency under each "
+        "connection strategy (per-request, persistent, pooled)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000)
+        parser.add_argument('--strategies', nargs='+', default=list(STRATEGIES),
+                            choices=list(STRATEGIES))
+        parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+        # Internal: measure the strategy configured in this process only
+        parser.add_argument('--single', action='store_true', help='(internal)')
+
+    def handle(self, *args, **options):
+        if options['single']:
+            self.stdout.write(json.dumps(self.measure(options['iterations'])))
+            return
+
+        results = {}
+        for name in options['strategies']:
+            # Django only pools PostgreSQL connections
+            if name == 'pooled' and not (
+                settings.DB_POOL_AVAILABLE and connection.vendor == 'postgresql'
+            ):
+                continue
+            output = subprocess.run(
+                [sys.executable, 'manage.py', 'benchmark_db', '--single',
+                 '--iterations', str(options['iterations'])],
+                cwd=settings.BASE_DIR,
+                env={**os.environ, **STRATEGIES[name]},
+                capture_output=True, text=True, check=True,
+            ).stdout
+            results[name] = json.loads(output.strip().splitlines()[-1])
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(f"{connection.vendor}, {options['iterations']} simulated requests")
+        self.stdout.write(f"{'strategy':<13}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'opens':>10}")
+        for name, stats in results.items():
+            self.stdout.write(
+                f"{name:<13}{stats['p50_ms']:>10}{stats['p99_ms']:>10}"
+                f"{stats['max_ms']:>10}{stats['opens']:>10}"
+            )
+
+    def measure(self, iterations):
+        """
+        Replay the connection lifecycle Django runs around each request
+        (close_old_connections on start and finish) around a single query.
+        `opens` counts connections Django had to open; with pooling those are
+        cheap checkouts from the pool rather than new server connections.
+        """
+        opens = 0
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(iterations):
+            request_started = time.perf_counter()
+            close_old_connections()
+            if connection.connection is None:
+                opens += 1
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+            close_old_connections()
+            latencies.append(time.perf_counter() - request_started)
+        stats = summarize(latencies, 0, time.perf_counter() - started)
+        stats['opens'] = opens
+        return stats
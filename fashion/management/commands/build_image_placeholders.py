@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from fashion.cache import bump_catalogue_generation
+from fashion.images import image_metadata, open_image, write_thumbnails
+from fashion.models import AboutContent, Product
+from fashion.prerender import on_edit
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute width, height, dominant colour and the inline placeholder of "
+        "product and About page images that don't have them yet (e.g. uploaded "
+        "before placeholders existed), and the admin thumbnails of locally "
+        "stored product images."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Recompute images that already have metadata.')
+
+    def handle(self, *args, **options):
+        products = Product.objects.filter(Q(image__gt='') | Q(image_url__gt='')).only(
+            'id', 'slug', 'image', 'image_url', 'image_meta',
+        )
+        if not options['force']:
+            stored_locally = Q(image__gt='') & (Q(image_url='') | Q(image_url__isnull=True))
+            products = products.filter(Q(image_meta={}) | (stored_locally & ~Q(image_meta__has_key='thumbnails')))
+
+        updated = 0
+        edits = []
+        for product in products.iterator():
+            url = product.get_image_display_url()
+            if product.image_meta and not options['force']:
+                meta = product.image_meta
+            else:
+                meta = self.metadata(url, product.image)
+                if meta:
+                    updated += 1
+                    edits.append(f'product {product.pk} {product.slug}')
+            if meta and product.image and url == product.image.url:
+                # Only the admin shows these: no page needs re-rendering for them
+                meta = {**meta, 'thumbnails': write_thumbnails(product.image.storage, product.image.name)}
+            if meta != product.image_meta:
+                # update() skips the per-row post_save invalidation; bump once below
+                Product.objects.filter(pk=product.pk).update(image_meta=meta)
+        if edits:
+            bump_catalogue_generation()
+            # ...and re-render the prerendered pages showing them
+            on_edit(edits, wait=True)
+
+        content = AboutContent.load()
+        changed = False
+        for prefix in ('founder', 'studio'):
+            if getattr(content, f'{prefix}_image_meta') and not options['force']:
+                continue
+            url = getattr(content, f'get_{prefix}_display_url')()
+            if url:
+                meta = self.metadata(url, getattr(content, f'{prefix}_image'))
+                if meta:
+                    setattr(content, f'{prefix}_image_meta', meta)
+                    changed = True
+                    updated += 1
+        if changed:
+            content.save()
+
+        self.stdout.write(self.style.SUCCESS(f'Built placeholders for {updated} image(s).'))
+
+    def metadata(self, url, image):
+        try:
+            with open_image(url, image) as file:
+                return image_metadata(file)
+        except OSError as error:
+            self.stderr.write(f'Skipped {url}: {error}')
+            return {}
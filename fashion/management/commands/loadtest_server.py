@@ -0,0 +1,49 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from fashion.benchmarks.loadgen import run_load
+from fashion.benchmarks.profiles import SERVER_PROFILE
+from fashion.benchmarks.servers import process_tree_rss_kb, run_server
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the bundled load-test profile against the tuned production server "
+        "configuration (fashion_site.gunicorn_conf) and plain gunicorn defaults."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', nargs='+', default=['default', 'tuned'],
+                            choices=['default', 'tuned'])
+        parser.add_argument('--duration-scale', type=float, default=1.0,
+                            help='Multiply every scenario duration (e.g. 0.2 for a smoke run).')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+
+    def handle(self, *args, **options):
+        results = {}
+        for server in options['servers']:
+            # "default" is what the Procfile used to run: one sync worker
+            mode, workers = ('wsgi', 1) if server == 'default' else ('tuned', None)
+            with run_server(mode, workers=workers) as (process, base_url):
+                results[server] = {}
+                for scenario in SERVER_PROFILE:
+                    url = base_url + scenario['path']
+                    run_load(url, concurrency=1, duration=0.5)
+                    stats = run_load(url, concurrency=scenario['concurrency'],
+                                     duration=scenario['duration'] * options['duration_scale'])
+                    stats['rss_mb'] = round(process_tree_rss_kb(process.pid) / 1024, 1)
+                    results[server][scenario['name']] = stats
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(f"{'server':<9}{'scenario':<18}{'req/s':>10}{'p50 ms':>10}"
+                          f"{'p99 ms':>10}{'errors':>8}{'RSS MB':>9}")
+        for server, scenarios in results.items():
+            for name, stats in scenarios.items():
+                self.stdout.write(
+                    f"{server:<9}{name:<18}{stats['throughput_rps']:>10}{stats['p50_ms']:>10}"
+                    f"{stats['p99_ms']:>10}{stats['errors']:>8}{stats['rss_mb']:>9}"
+                )
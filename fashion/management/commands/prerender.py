@@ -0,0 +1,38 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from fashion.prerender import apply_journal, full_build, is_enabled, prerender_root
+
+
+class Command(BaseCommand):
+    help = (
+        "Prerender the storefront (home, about, contact, collection and every "
+        "product page) to static files under PRERENDER_ROOT and make them live. "
+        "Run after every deploy and bulk catalogue change; single edits are "
+        "regenerated automatically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Processes rendering in parallel (default: one per CPU).',
+        )
+        parser.add_argument(
+            '--changes', action='store_true',
+            help='Only re-render pages affected by edits since the last build.',
+        )
+
+    def handle(self, *args, **options):
+        if options['changes']:
+            if not is_enabled():
+                self.stderr.write('Nothing prerendered yet; run without --changes first.')
+                return
+            pages, seconds = apply_journal()
+            self.stdout.write(self.style.SUCCESS(f'Re-rendered {pages} page(s) in {seconds:.1f}s.'))
+            return
+        pages, seconds = full_build(workers=options['workers'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Prerendered {pages} page(s) into {prerender_root()} in {seconds:.1f}s '
+            f"with {options['workers']} worker(s)."
+        ))
@@ -0,0 +1,120 @@
+import json
+import platform
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from fashion.benchmarks.loadgen import run_load
+from fashion.benchmarks.report import check_budgets, compare
+from fashion.benchmarks.scenarios import ADMIN_SCENARIOS, SCENARIOS, build_scenarios
+from fashion.benchmarks.seed import (
+    admin_session, clear_catalogue, mark_benchmark_uploads, scratch_database_problem, seed_catalogue, seed_inbox,
+)
+from fashion.benchmarks.servers import run_server
+from fashion.models import Product
+
+# Keep the benchmark server quiet and deterministic
+SERVER_ENV = {
+    'FASHION_LOG_LEVEL': 'WARNING',
+    'PROFILING_SAMPLE_RATE': '0',
+    'CLOUDINARY_URL': '',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed catalogues of each size, load the key storefront, API and dashboard "
+        "URLs through the production server config and report throughput, "
+        "latency percentiles and query counts, failing if an admin changelist "
+        "exceeds its latency budget. Refuses to run unless the database is a "
+        "scratch one, e.g. DATABASE_URL=sqlite:///bench.sqlite3."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10, 1000])
+        parser.add_argument('--scenarios', nargs='+', default=SCENARIOS, choices=SCENARIOS)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds per scenario.')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Worker processes (default: sized by gunicorn_conf).')
+        parser.add_argument('--output', help='Write results as JSON to this file.')
+        parser.add_argument('--baseline', help='Fail if results regress against this JSON file.')
+        parser.add_argument('--tolerance', type=float, default=0.15,
+                            help='Allowed latency/throughput drift against the baseline (fraction).')
+        parser.add_argument('--no-images', action='store_true')
+        parser.add_argument('--keep', action='store_true', help='Leave the last seeded catalogue in place.')
+        parser.add_argument('--yes-i-mean-it', action='store_true',
+                            help='Run even though the database holds real products or messages.')
+
+    def handle(self, *args, **options):
+        # Checked before migrate: nothing touches a live database
+        problem = scratch_database_problem()
+        if problem and not options['yes_i_mean_it']:
+            raise CommandError(f'{problem}: benchmark a scratch database (or pass --yes-i-mean-it).')
+        call_command('migrate', verbosity=0)
+        document = {
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'concurrency': options['concurrency'],
+                'duration_s': options['duration'],
+                'workers': options['workers'],
+            },
+            'results': {},
+        }
+        admin_cookie = None
+        if set(options['scenarios']) & set(ADMIN_SCENARIOS):
+            admin_cookie = f'{settings.SESSION_COOKIE_NAME}={admin_session()}'
+
+        started = timezone.now()
+        try:
+            for size in options['sizes']:
+                self.stdout.write(f'Seeding {size} products...')
+                seed_catalogue(size, with_images=not options['no_images'])
+                if admin_cookie:
+                    seed_inbox(size)
+                slugs = list(
+                    Product.objects.filter(is_available=True).values_list('slug', flat=True)[:1000]
+                ) or ['missing']
+                results = document['results'][str(size)] = {}
+
+                with run_server('tuned', workers=options['workers'], env=SERVER_ENV) as (_, base_url):
+                    scenarios = build_scenarios(base_url, slugs, options['scenarios'], admin_cookie)
+                    for name, make_request in scenarios.items():
+                        # Warm-up: imports, connections and the page cache
+                        run_load(make_request=make_request, concurrency=1, duration=0.5)
+                        concurrency = 1 if name in ADMIN_SCENARIOS else options['concurrency']
+                        stats = run_load(make_request=make_request,
+                                         concurrency=concurrency,
+                                         duration=options['duration'])
+                        results[name] = stats
+                        self.stdout.write(
+                            f"  {name:<18}{stats['throughput_rps']:>9} req/s"
+                            f"  p50 {stats['p50_ms']:>8} ms  p95 {stats['p95_ms']:>8} ms"
+                            f"  p99 {stats['p99_ms']:>8} ms  queries {stats.get('queries_max', '-'):>4}"
+                            f"  errors {stats['errors']}"
+                        )
+        finally:
+            mark_benchmark_uploads(started)
+            if not options['keep']:
+                clear_catalogue()
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(document, indent=2))
+            self.stdout.write(f"Results written to {options['output']}")
+
+        violations = check_budgets(document)
+        if violations:
+            raise CommandError('Latency budgets exceeded:\n  ' + '\n  '.join(violations))
+
+        if options['baseline']:
+            baseline = json.loads(Path(options['baseline']).read_text())
+            regressions = compare(document, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError('Performance regressions:\n  ' + '\n  '.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from fashion.benchmarks.seed import clear_catalogue, scratch_database_problem, seed_catalogue
+
+
+class Command(BaseCommand):
+    help = "Seed a synthetic catalogue (bench--* products with fake images) for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=1000, help='Number of products, e.g. 10, 1000, 50000.')
+        parser.add_argument('--no-images', action='store_true', help='Seed products without images.')
+        parser.add_argument('--clear', action='store_true', help='Only remove the seeded products.')
+        parser.add_argument('--yes-i-mean-it', action='store_true',
+                            help='Seed even though the database holds real products or messages.')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            removed = clear_catalogue()
+            self.stdout.write(self.style.SUCCESS(f'Removed {removed} seeded product(s).'))
+            return
+        problem = scratch_database_problem()
+        if problem and not options['yes_i_mean_it']:
+            raise CommandError(f'{problem}: seed a scratch database (or pass --yes-i-mean-it).')
+        seed_catalogue(options['size'], with_images=not options['no_images'])
+        self.stdout.write(self.style.SUCCESS(f"Seeded {options['size']} product(s)."))
@@ -0,0 +1,72 @@
+import json
+import platform
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from fashion.benchmarks.startup import (
+    BOOT_TARGETS, STARTUP_BUDGET_MS, by_package, cold_start_times, import_profile, summarize_times,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Profile a cold worker boot: the slowest imports (python -X importtime), "
+        "time per package and the median wall-clock boot time. Fails if the boot "
+        "exceeds its budget or regresses against a saved baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=list(BOOT_TARGETS), default='wsgi')
+        parser.add_argument('--repeat', type=int, default=7, help='Cold boots to time.')
+        parser.add_argument('--top', type=int, default=20, help='Slowest imports to list.')
+        parser.add_argument('--budget-ms', type=float, default=STARTUP_BUDGET_MS,
+                            help='Fail if the median boot is slower (0 disables).')
+        parser.add_argument('--output', help='Write results as JSON to this file.')
+        parser.add_argument('--baseline', help='Fail if the boot got slower than this JSON file.')
+        parser.add_argument('--tolerance', type=float, default=0.15,
+                            help='Allowed boot time drift against the baseline (fraction).')
+
+    def handle(self, *args, **options):
+        target = options['target']
+        modules = import_profile(target)
+        boot = summarize_times(cold_start_times(target, options['repeat']))
+
+        self.stdout.write(f'Slowest imports ({target}, cumulative):')
+        top_level = [module for module in modules if module['depth'] == 0]
+        for module in sorted(top_level, key=lambda m: -m['cumulative_ms'])[:options['top']]:
+            self.stdout.write(f"  {module['cumulative_ms']:>9.1f} ms  {module['module']}")
+        self.stdout.write('Import time by package (self):')
+        packages = by_package(modules)
+        for name, ms in packages[:options['top']]:
+            self.stdout.write(f'  {ms:>9.1f} ms  {name}')
+        self.stdout.write(
+            f"Cold boot: median {boot['median_ms']} ms "
+            f"(min {boot['min_ms']}, max {boot['max_ms']}, {boot['runs']} runs)"
+        )
+
+        document = {
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'target': target,
+            },
+            'boot': boot,
+            'packages': dict(packages),
+        }
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(document, indent=2))
+            self.stdout.write(f"Results written to {options['output']}")
+
+        failures = []
+        if options['budget_ms'] and boot['median_ms'] > options['budget_ms']:
+            failures.append(f"median boot {boot['median_ms']} ms > {options['budget_ms']} ms budget")
+        if options['baseline']:
+            before = json.loads(Path(options['baseline']).read_text())['boot']['median_ms']
+            if boot['median_ms'] > before * (1 + options['tolerance']):
+                failures.append(f"median boot {before} -> {boot['median_ms']} ms")
+        if failures:
+            raise CommandError('Startup regressions:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS('Startup within budget.'))
@@ -0,0 +1,53 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.conf import settings
+
+from fashion.warming import crawl_urls, warm
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the page, AboutContent, image-source, resized image and feed caches "
+        "by requesting the collection, home, about, contact, the product API, "
+        "every available product page and image, the sitemap and the product "
+        "feeds. Run after each deploy; safe while serving traffic."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--base-url',
+            help='Warm a running server (e.g. https://www.example.com) instead of this process. '
+                 'Needed when the cache backend is per-process (LocMemCache).',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=settings.WARM_CACHE_CONCURRENCY,
+            help='Requests in flight at once.',
+        )
+        parser.add_argument('--no-images', action='store_true', help='Skip the resized product images.')
+        parser.add_argument('--top', type=int, default=10, help='Slowest URLs to list.')
+        parser.add_argument('--json', action='store_true', help='Print every URL as JSON.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        paths = crawl_urls(images=not options['no_images'])
+        results = warm(paths, concurrency=options['concurrency'], base_url=options['base_url'])
+        elapsed = time.perf_counter() - started
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(f"{'ms':>9}  {'status':>6}  {'cache':<12}path")
+        for result in sorted(results, key=lambda result: -result['ms'])[:options['top']]:
+            self.stdout.write(
+                f"{result['ms']:>9}  {result['status'] or '-':>6}  {result['cache'] or '-':<12}{result['path']}"
+            )
+        failed = [result for result in results if result['status'] != 200]
+        warm_before = sum(result['cache'] in ('hit', 'prerendered') for result in results)
+        summary = (
+            f'Warmed {len(results)} URL(s) in {elapsed:.1f}s with concurrency {options["concurrency"]}: '
+            f'{warm_before} already warm, {len(failed)} failed.'
+        )
+        self.stdout.write(self.style.WARNING(summary) if failed else self.style.SUCCESS(summary))
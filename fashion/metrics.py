@@ -0,0 +1,260 @@
+"""
+Dependency-free metrics registry that aggregates across gunicorn workers.
+
+Every process keeps its counters, histograms and gauges in memory and
+periodically writes them to METRICS_DIR/<pid>.json. The /metrics view merges
+all files into Prometheus text format. Counters from workers that have exited
+(e.g. recycled by max_requests) are folded into archive.json so totals never
+go backwards; their gauges are dropped.
+"""
+
+import atexit
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+# Serialises compaction between workers (a no-op where flock doesn't exist)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name -> (type, help)
+METRICS = {
+    'fashion_http_requests_total': ('counter', 'HTTP requests by URL name, method and status class.'),
+    'fashion_http_request_duration_seconds': ('histogram', 'HTTP request latency by URL name.'),
+    'fashion_db_queries_total': ('counter', 'SQL queries executed, by URL name.'),
+    'fashion_cache_hits_total': ('counter', 'Page cache hits.'),
+    'fashion_cache_misses_total': ('counter', 'Page cache misses.'),
+    'fashion_db_pool_size': ('gauge', 'Connections held by the DB pool.'),
+    'fashion_db_pool_available': ('gauge', 'Idle connections in the DB pool.'),
+    'fashion_db_pool_waiting': ('gauge', 'Requests waiting for a pooled connection.'),
+    'fashion_media_uploads_in_progress': ('gauge', 'External media uploads currently running.'),
+    'fashion_prefetch_requests_total': ('counter', 'Speculative prefetch requests, by URL name (not counted as visits).'),
+    'fashion_image_cache_hits_total': ('counter', 'Resized image disk cache hits, by kind (variant or source).'),
+    'fashion_image_cache_misses_total': ('counter', 'Resized image disk cache misses, by kind (variant or source).'),
+    'fashion_image_cache_evictions_total': ('counter', 'Files evicted from the resized image disk cache.'),
+    'fashion_image_cache_evicted_bytes_total': ('counter', 'Bytes evicted from the resized image disk cache.'),
+    'fashion_image_coalesced_total': ('counter', 'Image requests that waited for a render already in progress.'),
+    'fashion_image_resize_duration_seconds': ('histogram', 'Time to fetch, resize and encode one image variant.'),
+}
+
+ARCHIVE_FILE = 'archive.json'
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+class MetricsRegistry:
+    """In-process metric store; flush() publishes it for the other workers."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+        self._last_flush = 0.0
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {
+                    'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0,
+                }
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram['buckets'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def add_gauge(self, name, value, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + value
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, dict(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, dict(labels), dict(h, buckets=list(h['buckets']))]
+                               for (name, labels), h in self._histograms.items()],
+                'gauges': [[name, dict(labels), value] for (name, labels), value in self._gauges.items()],
+            }
+
+    def flush(self, force=False):
+        """Write this process's metrics file, at most every METRICS_FLUSH_INTERVAL."""
+        now = time.monotonic()
+        if not force and now - self._last_flush < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        directory = Path(settings.METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        _write_json(directory / f'{os.getpid()}.json', self.snapshot())
+
+
+registry = MetricsRegistry()
+atexit.register(lambda: registry.flush(force=True))
+
+
+def _write_json(path, data):
+    # Write-then-rename so readers never see a half-written file
+    tmp_path = path.with_suffix(f'.{threading.get_ident()}.tmp')
+    tmp_path.write_text(json.dumps(data))
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merge(into, snapshot, include_gauges=True):
+    for name, labels, value in snapshot.get('counters', []):
+        key = _key(name, labels)
+        into['counters'][key] = into['counters'].get(key, 0) + value
+    for name, labels, histogram in snapshot.get('histograms', []):
+        key = _key(name, labels)
+        merged = into['histograms'].get(key)
+        if merged is None:
+            into['histograms'][key] = dict(histogram, buckets=list(histogram['buckets']))
+            continue
+        merged['buckets'] = [a + b for a, b in zip(merged['buckets'], histogram['buckets'])]
+        merged['sum'] += histogram['sum']
+        merged['count'] += histogram['count']
+    if include_gauges:
+        for name, labels, value in snapshot.get('gauges', []):
+            key = _key(name, labels)
+            into['gauges'][key] = into['gauges'].get(key, 0) + value
+
+
+def _as_snapshot(merged):
+    return {
+        'counters': [[name, dict(labels), value] for (name, labels), value in merged['counters'].items()],
+        'histograms': [[name, dict(labels), h] for (name, labels), h in merged['histograms'].items()],
+        'gauges': [],
+    }
+
+
+def _compact_dead_workers(directory):
+    """Fold metrics files of exited processes into the archive (lock held)."""
+    dead = [
+        path for path in directory.glob('*.json')
+        if path.stem.isdigit() and not _pid_alive(int(path.stem))
+    ]
+    if not dead:
+        return
+    archive = {'counters': {}, 'histograms': {}, 'gauges': {}}
+    _merge(archive, _read_json(directory / ARCHIVE_FILE) or {})
+    for path in dead:
+        _merge(archive, _read_json(path) or {}, include_gauges=False)
+    _write_json(directory / ARCHIVE_FILE, _as_snapshot(archive))
+    for path in dead:
+        path.unlink(missing_ok=True)
+
+
+def collect():
+    """Merge the metrics of every worker (live and archived)."""
+    registry.flush(force=True)
+    directory = Path(settings.METRICS_DIR)
+    merged = {'counters': {}, 'histograms': {}, 'gauges': {}}
+    # Compaction and reading share a lock so nothing is counted twice
+    with open(directory / '.lock', 'w') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        _compact_dead_workers(directory)
+        for path in directory.glob('*.json'):
+            snapshot = _read_json(path)
+            if snapshot:
+                _merge(merged, snapshot)
+    return merged
+
+
+def reset_metrics_dir():
+    """Start a server run with an empty metrics directory."""
+    shutil.rmtree(settings.METRICS_DIR, ignore_errors=True)
+    Path(settings.METRICS_DIR).mkdir(parents=True, exist_ok=True)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(merged, buckets=DEFAULT_BUCKETS):
+    """Prometheus text exposition format (version 0.0.4)."""
+    by_name = {}
+    for kind in ('counters', 'histograms', 'gauges'):
+        for (name, labels), value in merged[kind].items():
+            by_name.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name in sorted(by_name):
+        kind, help_text = METRICS.get(name, ('untyped', ''))
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in sorted(by_name[name]):
+            if kind != 'histogram':
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                continue
+            for bound, count in zip(buckets, value['buckets']):
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", str(bound)),))} {count}')
+            lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {value["count"]}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(value["sum"])}')
+            lines.append(f'{name}_count{_format_labels(labels)} {value["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def sample_db_pools():
+    """Record the pool gauges of this process's pooled connections."""
+    from django.db import connections
+
+    for alias in connections:
+        connection = connections[alias]
+        if connection.vendor != 'postgresql' or not connection.settings_dict.get('OPTIONS', {}).get('pool'):
+            continue
+        stats = connection.pool.get_stats()
+        registry.set_gauge('fashion_db_pool_size', stats.get('pool_size', 0), alias=alias)
+        registry.set_gauge('fashion_db_pool_available', stats.get('pool_available', 0), alias=alias)
+        registry.set_gauge('fashion_db_pool_waiting', stats.get('requests_waiting', 0), alias=alias)
@@ -0,0 +1,524 @@
+import cProfile
+import gzip
+import json
+import logging
+import random
+import re
+import threading
+import time
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.urls import Resolver404, resolve
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+from .cache import get_cached_page, set_cached_page
+from .metrics import registry, sample_db_pools
+from .popularity import is_prefetch, popularity, product_path_prefix
+from .prerender import PRERENDER_HEADER, prerendered_page
+from .profiling import RequestProfile, current_profile
+from .routers import primary_reads_pinned, read_from_replica
+
+# Brotli is optional - fall back to gzip when it isn't installed
+try:
+    import brotli
+    BROTLI_ENABLED = True
+except ImportError:
+    BROTLI_ENABLED = False
+
+logger = logging.getLogger('fashion.performance')
+
+
+# Blocks whose whitespace is significant and must reach the browser untouched
+PROTECTED_BLOCK_RE = re.compile(
+    r'(<(pre|script|textarea)\b[^>]*>.*?</\2\s*>)',
+    re.IGNORECASE | re.DOTALL,
+)
+# Plain comments only - conditional comments (<!--[if ...]>) are kept
+COMMENT_RE = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)
+WHITESPACE_RE = re.compile(r'\s{2,}')
+
+# Headers that are recomputed when a cached page is served
+UNCACHED_HEADERS = {'content-length', 'content-encoding', 'vary', 'set-cookie'}
+
+MIN_COMPRESS_LENGTH = 200
+
+# Brotli's max quality is worth it once per cache fill, but far too slow per request
+BROTLI_DYNAMIC_QUALITY = 5
+
+
+def minify_html(html):
+    """
+    Collapse template indentation and drop comments.
+    <pre>, <script> and <textarea> blocks are passed through verbatim.
+    """
+    parts = PROTECTED_BLOCK_RE.split(html)
+    out = []
+    # split() yields: text, whole block, tag name, text, whole block, tag name, ...
+    for index in range(0, len(parts), 3):
+        text = COMMENT_RE.sub('', parts[index])
+        out.append(WHITESPACE_RE.sub(
+            lambda m: '\n' if '\n' in m.group(0) else ' ', text
+        ))
+        if index + 1 < len(parts):
+            out.append(parts[index + 1])
+    return ''.join(out)
+
+
+def negotiate_encoding(accept_encoding):
+    """Pick 'br', 'gzip' or 'identity' from an Accept-Encoding header."""
+    accepted = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = quality
+
+    if BROTLI_ENABLED and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', accepted.get('*', 0)) > 0:
+        return 'gzip'
+    return 'identity'
+
+
+def compress_variants(body):
+    """Build every encoding of a page body once, for storage in the page cache."""
+    variants = {
+        'identity': body,
+        'gzip': gzip.compress(body, compresslevel=9),
+    }
+    if BROTLI_ENABLED:
+        variants['br'] = brotli.compress(body, mode=brotli.MODE_TEXT)
+    return variants
+
+
+def url_name_for(request):
+    """URL name of the request, also for responses served before URL resolution."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+    return match.url_name
+
+
+def is_html(response):
+    return response.get('Content-Type', '').startswith('text/html')
+
+
+def is_shareable_response(response):
+    """True if a response may be stored and served to every visitor."""
+    if response.status_code != 200 or response.cookies:
+        return False
+    # Pages that depend on the session can't be shared between visitors
+    return 'Cookie' not in response.get('Vary', '')
+
+
+class PrerenderMiddleware:
+    """
+    Answer GETs for prerendered storefront pages (see fashion.prerender)
+    straight from disk, in the encoding the client accepts. Anything not
+    prerendered, or stale because edits are pending, falls through to Django.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._process_request(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self._process_request(request) or await self.get_response(request)
+
+    def _process_request(self, request):
+        if (
+            request.method not in ('GET', 'HEAD')
+            or request.META.get('QUERY_STRING')
+            or PRERENDER_HEADER in request.META
+        ):
+            return None
+        encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        page = prerendered_page(request.path_info, encoding)
+        if page is None:
+            return None
+        body, headers, encoding = page
+        response = HttpResponse(body)
+        for name, value in headers.items():
+            response[name] = value
+        if encoding != 'identity':
+            response['Content-Encoding'] = encoding
+        response['Content-Length'] = str(len(body))
+        response['X-Page-Cache'] = 'prerendered'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+class HTMLPipelineMiddleware:
+    """
+    Minify and compress HTML responses.
+
+    Anonymous GETs for the storefront pages in PAGE_CACHE_URL_NAMES are stored
+    in the page cache with every encoding pre-built, so compression happens
+    once per cache fill. Everything else is minified and compressed per request.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        cached = self._process_request(request)
+        if cached is not None:
+            return cached
+        return self._process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        cached = self._process_request(request)
+        if cached is not None:
+            return cached
+        return self._process_response(request, await self.get_response(request))
+
+    def _process_request(self, request):
+        request.page_cacheable = self._is_cacheable_request(request)
+        request.page_encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        # Prerender and warm renders must see the database, never a page
+        # cached from before the edit they follow
+        if request.page_cacheable and PRERENDER_HEADER not in request.META:
+            entry = get_cached_page(request.path, request.META.get('QUERY_STRING', ''))
+            if entry is not None:
+                return self._from_cache(entry, request.page_encoding, 'hit')
+        return None
+
+    def _process_response(self, request, response):
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or not is_html(response)
+        ):
+            return response
+
+        encoding = request.page_encoding
+        body = minify_html(response.content.decode(response.charset)).encode(response.charset)
+
+        if request.page_cacheable and is_shareable_response(response):
+            entry = {
+                'status': response.status_code,
+                'headers': [
+                    (name, value) for name, value in response.items()
+                    if name.lower() not in UNCACHED_HEADERS
+                ],
+                'variants': compress_variants(body),
+            }
+            set_cached_page(request.path, request.META.get('QUERY_STRING', ''), entry)
+            return self._from_cache(entry, encoding, 'miss')
+
+        response.content = body
+        if len(body) >= MIN_COMPRESS_LENGTH:
+            patch_vary_headers(response, ('Accept-Encoding',))
+            if encoding == 'br' and settings.CSRF_COOKIE_NAME in response.cookies:
+                # The page carries a CSRF token (it renews the cookie) and Brotli
+                # can't be padded like gzip below: keep it BREACH-safe
+                encoding = 'gzip'
+            if encoding == 'br':
+                response.content = brotli.compress(
+                    body, mode=brotli.MODE_TEXT, quality=BROTLI_DYNAMIC_QUALITY
+                )
+                response['Content-Encoding'] = 'br'
+            elif encoding == 'gzip':
+                # Randomised padding mitigates BREACH on pages carrying CSRF tokens
+                response.content = compress_string(body, max_random_bytes=100)
+                response['Content-Encoding'] = 'gzip'
+            response['Content-Length'] = str(len(response.content))
+        return response
+
+    def _is_cacheable_request(self, request):
+        if request.method != 'GET':
+            return False
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        return match.url_name in settings.PAGE_CACHE_URL_NAMES
+
+    def _from_cache(self, entry, encoding, status):
+        if encoding not in entry['variants']:
+            encoding = 'identity'
+        response = HttpResponse(entry['variants'][encoding], status=entry['status'])
+        for name, value in entry['headers']:
+            response[name] = value
+        if encoding != 'identity':
+            response['Content-Encoding'] = encoding
+        response['Content-Length'] = str(len(response.content))
+        response['X-Page-Cache'] = status
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+class PopularityMiddleware:
+    """
+    Count visits to product pages for prefetch ranking (see fashion.popularity),
+    whichever layer answers them. Prefetches and internal renders don't count.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = None
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self._record(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        self._record(request, response)
+        return response
+
+    def _record(self, request, response):
+        if self.prefix is None:
+            self.prefix = product_path_prefix()
+        if (
+            request.method != 'GET'
+            or response.status_code != 200
+            or not request.path_info.startswith(self.prefix)
+            or PRERENDER_HEADER in request.META
+        ):
+            return
+        if is_prefetch(request):
+            registry.inc('fashion_prefetch_requests_total', view='product_detail')
+            return
+        slug = request.path_info[len(self.prefix):].strip('/')
+        if slug and '/' not in slug:
+            popularity.record(slug)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let anonymous storefront reads (REPLICA_READ_URL_NAMES) use the read
+    replicas. A visitor who just wrote something gets a short-lived cookie
+    that pins their reads to the primary so they see their own changes.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = read_from_replica.set(self._may_use_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            read_from_replica.reset(token)
+        return self._process_response(request, response)
+
+    async def __acall__(self, request):
+        token = read_from_replica.set(self._may_use_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_from_replica.reset(token)
+        return self._process_response(request, response)
+
+    def _may_use_replica(self, request):
+        if not settings.REPLICA_DATABASES or request.method not in ('GET', 'HEAD'):
+            return False
+        if settings.REPLICA_STICKY_COOKIE in request.COOKIES:
+            return False
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        if match.url_name not in settings.REPLICA_READ_URL_NAMES:
+            return False
+        return not primary_reads_pinned()
+
+    def _process_response(self, request, response):
+        if settings.REPLICA_DATABASES and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+
+# Held while a request runs under cProfile
+_profiler_lock = threading.Lock()
+
+
+class ProfilingMiddleware:
+    """
+    Record per-request SQL count and time, template time, cache hits/misses and
+    upload time. They are sent as a Server-Timing header and logged as one JSON
+    line. Requests slower than PROFILING_SLOW_REQUEST_MS also log their SQL, and
+    a PROFILING_SAMPLE_RATE share of requests run under cProfile, dumped to
+    PROFILING_DUMP_DIR when they turn out slow.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile = request.profile = RequestProfile()
+        token = current_profile.set(profile)
+        profiler = None
+        try:
+            profiler = self._start_profiler()
+            response = self.get_response(request)
+        finally:
+            if profiler:
+                self._stop_profiler(profiler)
+            current_profile.reset(token)
+        return self._process_response(request, response, profile, profiler)
+
+    async def __acall__(self, request):
+        profile = request.profile = RequestProfile()
+        token = current_profile.set(profile)
+        # cProfile follows one thread, which interleaves requests under ASGI
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        return self._process_response(request, response, profile, None)
+
+    def _start_profiler(self):
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return None
+        # Only one profiler may run per process (sys.monitoring since 3.12):
+        # a sampled request overlapping another one simply isn't profiled
+        if not _profiler_lock.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiling tool (a debugger, coverage) is active
+            _profiler_lock.release()
+            return None
+        return profiler
+
+    def _stop_profiler(self, profiler):
+        profiler.disable()
+        _profiler_lock.release()
+
+    def _process_response(self, request, response, profile, profiler):
+        stats = profile.as_dict()
+        response['Server-Timing'] = profile.server_timing()
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': url_name_for(request),
+            'status': response.status_code,
+            **stats,
+        }
+        slow = stats['total_ms'] >= settings.PROFILING_SLOW_REQUEST_MS
+        if not slow:
+            logger.info(json.dumps(record))
+            return response
+
+        record['slow'] = True
+        record['sql'] = profile.sql
+        if profiler:
+            record['profile'] = self._dump_profile(profiler, request)
+        logger.warning(json.dumps(record))
+        return response
+
+    def _dump_profile(self, profiler, request):
+        dump_dir = Path(settings.PROFILING_DUMP_DIR)
+        dump_dir.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r'[^a-zA-Z0-9]+', '-', request.path).strip('-') or 'root'
+        path = dump_dir / f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}.prof"
+        profiler.dump_stats(path)
+        return str(path)
+
+
+class MetricsMiddleware:
+    """
+    Feed the metrics registry: request count, latency histogram and query
+    count per URL name, page cache hits/misses and DB pool gauges.
+    Must sit outside ProfilingMiddleware, whose RequestProfile it reads.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self._record(request, response, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self._record(request, response, time.perf_counter() - started)
+        return response
+
+    def _record(self, request, response, duration):
+        # Unmatched URLs share one label so scanners can't blow up cardinality
+        view = url_name_for(request) or 'unmatched'
+        registry.inc(
+            'fashion_http_requests_total',
+            view=view, method=request.method, status=f'{response.status_code // 100}xx',
+        )
+        registry.observe('fashion_http_request_duration_seconds', duration, view=view)
+
+        profile = getattr(request, 'profile', None)
+        if profile is not None:
+            registry.inc('fashion_db_queries_total', profile.queries, view=view)
+            registry.inc('fashion_cache_hits_total', profile.cache_hits)
+            registry.inc('fashion_cache_misses_total', profile.cache_misses)
+
+        sample_db_pools()
+        registry.flush()
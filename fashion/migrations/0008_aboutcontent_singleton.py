@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:54
+
+from django.db import migrations, models
+
+
+def collapse_to_singleton(apps, schema_editor):
+    """Keep the row the site was showing (the lowest id) and move it to id=1."""
+    AboutContent = apps.get_model('fashion', 'AboutContent')
+    keep = AboutContent.objects.order_by('pk').first()
+    if keep is None:
+        return
+    AboutContent.objects.exclude(pk=keep.pk).delete()
+    if keep.pk != 1:
+        AboutContent.objects.filter(pk=keep.pk).update(id=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fashion', '0007_product_video_product_video_url_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(collapse_to_singleton, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='aboutcontent',
+            constraint=models.CheckConstraint(condition=models.Q(('id', 1)), name='aboutcontent_singleton'),
+        ),
+    ]
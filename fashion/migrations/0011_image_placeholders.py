@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fashion', '0010_product_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aboutcontent',
+            name='founder_image_meta',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='aboutcontent',
+            name='studio_image_meta',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_meta',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:29
+
+from django.db import migrations, models
+
+
+def backfill_updated_at(apps, schema_editor):
+    """Date existing products' last change to their creation; nothing better is known."""
+    Product = apps.get_model('fashion', 'Product')
+    Product.objects.update(updated_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fashion', '0011_image_placeholders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,16 @@
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
 from django.db import models
+from django.urls import reverse
 from django.utils.text import slugify
 
+from .images import image_version, placeholder_style, write_thumbnails
+from .profiling import record_cache
+
 class Product(models.Model):
     # Main category choices
     CATEGORY_CHOICES = [
@@ -53,6 +63,8 @@ class Product(models.Model):
     # --- IMAGE FIELDS ---
     image = models.ImageField(upload_to="products/", blank=True, null=True)
     image_url = models.URLField(max_length=500, blank=True, null=True)
+    # width, height, color and inline placeholder (see fashion.images.image_metadata)
+    image_meta = models.JSONField(blank=True, default=dict)
 
     # --- VIDEO FIELDS (NEW) ---
     video = models.FileField(upload_to="products/videos/", blank=True, null=True)
@@ -60,7 +72,24 @@ class Product(models.Model):
     
     is_available = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # <lastmod> in sitemap.xml and the product feed (see fashion.feeds)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Newest-first listings, alone and under each admin filter
+            models.Index(fields=['-created_at'], name='product_created_idx'),
+            models.Index(fields=['category', '-created_at'], name='product_category_idx'),
+            models.Index(fields=['is_available', '-created_at'], name='product_available_idx'),
+        ]
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The slug as stored, so a save can tell the URL moved (see fashion.signals)
+        instance._stored_slug = instance.__dict__.get('slug')
+        return instance
+
     def get_image_display_url(self):
         """Return Cloudinary URL if available, otherwise local image URL."""
         if self.image_url:
@@ -69,6 +98,41 @@ class Product(models.Model):
             return self.image.url
         return ''
 
+    def get_image_placeholder_style(self):
+        return placeholder_style(self.image_meta)
+
+    def get_image_srcset(self):
+        """srcset of resized variants (see fashion.imageproxy), never wider than the original."""
+        if not (self.image_url or self.image):
+            return ''
+        original_width = self.image_meta.get('width') if self.image_meta else None
+        return ', '.join(
+            f"{self.get_image_variant_url(width)} {width}w"
+            for width in settings.IMAGE_PROXY_SRCSET_WIDTHS
+            if original_width is None or width < original_width
+        )
+
+    def get_image_variant_url(self, width, fmt='auto'):
+        """
+        /img/ URL of a resized variant, versioned by the current image so it
+        can be cached for good (see fashion.views.product_image).
+        """
+        url = reverse('product_image', args=[self.pk, width, fmt])
+        return f'{url}?v={image_version(self.get_image_display_url())}'
+
+    def build_thumbnails(self):
+        """
+        Store a new local image right away (instead of on save) and write its
+        admin thumbnails, listing them in image_meta. Call before saving.
+        """
+        if not self.image or not isinstance(self.image.storage, FileSystemStorage):
+            return
+        if not self.image._committed:
+            self.image.save(self.image.name, self.image.file, save=False)
+        thumbnails = write_thumbnails(self.image.storage, self.image.name)
+        if thumbnails and self.image_meta:
+            self.image_meta = {**self.image_meta, 'thumbnails': thumbnails}
+
     def get_video_display_url(self):
         """Return Cloudinary URL if available, otherwise local video URL."""
         if self.video_url:
@@ -80,9 +144,15 @@ class Product(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(self.name)
+            # Fetch every taken "<base>" / "<base>-N" slug in one query
+            taken = set(
+                Product.objects.filter(slug__regex=rf'^{re.escape(base_slug)}(-[0-9]+)?$')
+                .exclude(pk=self.pk)
+                .values_list('slug', flat=True)
+            )
             slug = base_slug
             counter = 1
-            while Product.objects.filter(slug=slug).exclude(pk=self.pk).exists():
+            while slug in taken:
                 slug = f"{base_slug}-{counter}"
                 counter += 1
             self.slug = slug
@@ -100,21 +170,59 @@ class Product(models.Model):
 
 class AboutContent(models.Model):
     """Model to manage images for the About page (Singleton)."""
+    # The single row always has this primary key (enforced by a DB constraint)
+    SINGLETON_PK = 1
+    CACHE_KEY = 'fashion:about-content'
+
     founder_image = models.ImageField(upload_to="about/", blank=True, null=True)
     founder_image_url = models.URLField(max_length=500, blank=True, null=True)
+    founder_image_meta = models.JSONField(blank=True, default=dict)
     
     studio_image = models.ImageField(upload_to="about/", blank=True, null=True)
     studio_image_url = models.URLField(max_length=500, blank=True, null=True)
+    studio_image_meta = models.JSONField(blank=True, default=dict)
     
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.CheckConstraint(condition=models.Q(id=1), name='aboutcontent_singleton'),
+        ]
+
     def save(self, *args, **kwargs):
-        # Ensure only one instance exists
-        if not self.pk and AboutContent.objects.exists():
-            existing = AboutContent.objects.first()
-            self.pk = existing.pk
+        # Every save targets the one row, so concurrent edits can't create a second
+        self.pk = self.SINGLETON_PK
         super().save(*args, **kwargs)
 
+    @classmethod
+    def load(cls):
+        """
+        Return the singleton, from the cache when possible.
+        The cached copy is dropped whenever the row is saved (see signals) and
+        expires like cached pages, should that delete ever be lost.
+        """
+        content = cache.get(cls.CACHE_KEY)
+        record_cache(content is not None)
+        if content is None:
+            content = cls._load_and_cache()
+        return content
+
+    @classmethod
+    async def aload(cls):
+        """Async load(); only a cache miss hops to a thread for the DB."""
+        content = await cache.aget(cls.CACHE_KEY)
+        record_cache(content is not None)
+        if content is None:
+            content = await sync_to_async(cls._load_and_cache)()
+        return content
+
+    @classmethod
+    def _load_and_cache(cls):
+        # get_or_create retries the read if a concurrent request inserted first
+        content, _ = cls.objects.get_or_create(pk=cls.SINGLETON_PK)
+        cache.set(cls.CACHE_KEY, content, settings.PAGE_CACHE_TIMEOUT)
+        return content
+
     def __str__(self):
         return "About Page Content"
     
@@ -128,6 +236,12 @@ class AboutContent(models.Model):
         if self.studio_image: return self.studio_image.url
         return None
 
+    def get_founder_placeholder_style(self):
+        return placeholder_style(self.founder_image_meta)
+
+    def get_studio_placeholder_style(self):
+        return placeholder_style(self.studio_image_meta)
+
 
 class ContactMessage(models.Model):
     name = models.CharField(max_length=100)
@@ -135,5 +249,16 @@ class ContactMessage(models.Model):
     message = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # --- INBOX TRACKING ---
+    is_read = models.BooleanField(default=False)
+    handled_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Admin inbox: newest first, optionally only unread
+            models.Index(fields=['is_read', '-created_at'], name='contact_inbox_idx'),
+            models.Index(fields=['-created_at'], name='contact_created_idx'),
+        ]
+
     def __str__(self):
         return self.name
\ No newline at end of file
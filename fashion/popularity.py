@@ -0,0 +1,164 @@
+"""
+Product popularity, for speculative prefetching of the likely next page.
+
+Product page views (never prefetches) are counted in memory and merged into
+hourly buckets in the cache at most every POPULARITY_FLUSH_INTERVAL seconds,
+so a view costs a dict update, not a cache round trip. Scores sum the last
+POPULARITY_WINDOW_HOURS buckets. Merging is read-modify-write, so workers
+flushing at the same instant may drop a few counts; a ranking doesn't mind.
+"""
+
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+
+BUCKET_KEY_PREFIX = 'fashion:popularity'
+BUCKET_SECONDS = 3600
+
+# Products kept per hourly bucket; the long tail never makes the top anyway
+MAX_TRACKED = 1000
+
+# Request headers browsers send with prefetches (speculation rules, <link rel=prefetch>)
+PREFETCH_HEADERS = {
+    'HTTP_SEC_PURPOSE': 'prefetch',
+    'HTTP_PURPOSE': 'prefetch',
+    'HTTP_X_MOZ': 'prefetch',
+}
+
+
+def is_prefetch(request):
+    """True for speculative requests, which must not count as visits."""
+    return any(
+        request.META.get(header, '').lower().startswith(value)
+        for header, value in PREFETCH_HEADERS.items()
+    )
+
+
+def product_path_prefix():
+    """'/product/' of /product/<slug>/."""
+    return reverse('product_detail', args=['slug']).rsplit('slug', 1)[0]
+
+
+def bucket_key(bucket):
+    return f'{BUCKET_KEY_PREFIX}:{bucket}'
+
+
+class PopularityCounter:
+    """Per-process view counts, merged into the shared hourly buckets."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_flush = time.monotonic()
+        self._scores = None
+        self._scores_at = 0.0
+
+    def record(self, slug):
+        with self._lock:
+            self._pending[slug] = self._pending.get(slug, 0) + 1
+            due = time.monotonic() - self._last_flush >= settings.POPULARITY_FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+        key = bucket_key(int(time.time()) // BUCKET_SECONDS)
+        counts = cache.get(key) or {}
+        for slug, views in pending.items():
+            counts[slug] = counts.get(slug, 0) + views
+        if len(counts) > MAX_TRACKED:
+            counts = dict(sorted(counts.items(), key=lambda item: -item[1])[:MAX_TRACKED])
+        cache.set(key, counts, settings.POPULARITY_WINDOW_HOURS * BUCKET_SECONDS + BUCKET_SECONDS)
+
+    def _fresh_scores(self):
+        if self._scores is not None and time.monotonic() - self._scores_at < 60:
+            return self._scores
+        return None
+
+    def _window_keys(self):
+        current = int(time.time()) // BUCKET_SECONDS
+        return [
+            bucket_key(bucket)
+            for bucket in range(current - settings.POPULARITY_WINDOW_HOURS + 1, current + 1)
+        ]
+
+    def _merge(self, buckets):
+        scores = {}
+        for counts in buckets.values():
+            for slug, views in counts.items():
+                scores[slug] = scores.get(slug, 0) + views
+        self._scores, self._scores_at = scores, time.monotonic()
+        return scores
+
+    def scores(self):
+        """slug -> views over the window; re-read from the cache at most once a minute."""
+        scores = self._fresh_scores()
+        if scores is None:
+            scores = self._merge(cache.get_many(self._window_keys()))
+        return scores
+
+    async def ascores(self):
+        """Async scores(), for views running on the event loop."""
+        scores = self._fresh_scores()
+        if scores is None:
+            scores = self._merge(await cache.aget_many(self._window_keys()))
+        return scores
+
+    def reset(self):
+        with self._lock:
+            self._pending = {}
+        self._scores = None
+
+    def top(self, limit, among=None):
+        """The `limit` most viewed slugs, optionally only those in `among`."""
+        return self._top(self.scores(), limit, among)
+
+    async def atop(self, limit, among=None):
+        return self._top(await self.ascores(), limit, among)
+
+    def _top(self, scores, limit, among):
+        slugs = scores if among is None else [slug for slug in among if slug in scores]
+        return sorted(slugs, key=lambda slug: -scores[slug])[:limit]
+
+
+popularity = PopularityCounter()
+
+
+def prefetch_context(slugs):
+    """
+    Template context for fashion/_prefetch.html: the most popular of the
+    product pages linked from a page, and speculation rules prefetching them
+    at once and any other product page on hover.
+    """
+    return _prefetch_context(popularity.top(settings.PREFETCH_COUNT, among=slugs))
+
+
+async def aprefetch_context(slugs):
+    """Async prefetch_context(), reading the popularity counts with cache.aget_many."""
+    return _prefetch_context(await popularity.atop(settings.PREFETCH_COUNT, among=slugs))
+
+
+def _prefetch_context(popular):
+    prefix = product_path_prefix()
+    urls = [f'{prefix}{slug}/' for slug in popular]
+    rules = {'prefetch': [{
+        'source': 'document',
+        'where': {'href_matches': f'{prefix}*'},
+        'eagerness': 'moderate',
+    }]}
+    if urls:
+        rules['prefetch'].insert(0, {'source': 'list', 'urls': urls, 'eagerness': 'immediate'})
+    # Inline <script> content: never let a value close the tag
+    return {
+        'rules': json.dumps(rules).replace('<', '\\u003c'),
+        'urls': json.dumps(urls).replace('<', '\\u003c'),
+        'prefix': json.dumps(prefix),
+    }
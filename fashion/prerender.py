@@ -0,0 +1,442 @@
+"""
+Static prerendering of the storefront.
+
+The public pages (PRERENDER_URL_NAMES plus every product page) are rendered
+through the full middleware stack and written, minified and pre-compressed,
+under PRERENDER_ROOT:
+
+    builds/<id>/collection/index.html{,.gz,.br,.json}
+    current -> builds/<id>
+    journal
+
+A full build renders every page into a fresh directory in parallel and swaps
+the `current` symlink in one rename, so readers never see a half-written
+tree. Edits append a line to the journal once committed; a background
+regeneration renders only the affected pages into `current` (each file
+replaced atomically) and records how much of the journal the build covers.
+A build is only served while it covers the whole journal, so between an edit
+and its regeneration pages fall back to Django instead of going stale.
+
+Serving is done by fashion.middleware.PrerenderMiddleware; a front proxy can
+also serve `current` directly (see DEPLOY.md).
+"""
+
+import contextlib
+import io
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import close_old_connections, connections
+from django.urls import reverse
+
+from .models import Product
+
+# Advisory lock serialising builds between the workers of one host
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+PRERENDER_URL_NAMES = ['home', 'about', 'contact', 'collection']
+
+CURRENT_NAME = 'current'
+BUILDS_DIR = 'builds'
+JOURNAL_NAME = 'journal'
+LOCK_NAME = '.lock'
+# Inside a build: how much of the journal it covers, and what it was built from
+STAMP_NAME = '.stamp'
+MANIFEST_NAME = 'build.json'
+
+PAGE_NAME = 'index.html'
+HEADERS_SUFFIX = '.json'
+ENCODING_SUFFIXES = {'identity': '', 'gzip': '.gz', 'br': '.br'}
+
+# Marks the internal render requests so PrerenderMiddleware doesn't answer them
+PRERENDER_HEADER = 'HTTP_X_PRERENDER'
+
+# Headers that differ per request and are not stored with a page
+REQUEST_HEADERS = {'content-length', 'content-encoding', 'vary', 'set-cookie', 'server-timing', 'x-page-cache'}
+
+# Product pages show the 4 newest available products of their category other
+# than themselves, so they change when a product enters or leaves the newest 5
+RELATED_WINDOW = 5
+
+# Builds kept besides `current`, for requests still reading the previous one
+KEEP_PREVIOUS_BUILDS = 1
+
+
+def prerender_root():
+    return str(settings.PRERENDER_ROOT)
+
+
+def current_build():
+    """Directory of the live build, or None when nothing was prerendered."""
+    link = os.path.join(prerender_root(), CURRENT_NAME)
+    try:
+        return os.path.join(prerender_root(), os.readlink(link))
+    except OSError:
+        return None
+
+
+def is_enabled():
+    return current_build() is not None
+
+
+def page_file(build, path):
+    """File of the page at URL `path` in `build`, or None for unsafe paths."""
+    parts = path.strip('/').split('/') if path.strip('/') else []
+    if not path.endswith('/') or any(part in ('', '.', '..') or part.startswith('.') for part in parts):
+        return None
+    return os.path.join(build, *parts, PAGE_NAME)
+
+
+def journal_size():
+    try:
+        return os.stat(os.path.join(prerender_root(), JOURNAL_NAME)).st_size
+    except FileNotFoundError:
+        return 0
+
+
+def read_stamp(build):
+    try:
+        with open(os.path.join(build, STAMP_NAME)) as file:
+            return int(file.read())
+    except (OSError, ValueError):
+        return None
+
+
+def prerendered_page(path, encoding):
+    """
+    (body, headers, encoding) of a prerendered page, or None when the page
+    wasn't prerendered or edits since the last build are still pending.
+    """
+    build = current_build()
+    if build is None:
+        return None
+    name = page_file(build, path)
+    if name is None or read_stamp(build) != journal_size():
+        return None
+    try:
+        with open(name + HEADERS_SUFFIX) as file:
+            headers = json.load(file)
+        try:
+            with open(name + ENCODING_SUFFIXES[encoding], 'rb') as file:
+                return file.read(), headers, encoding
+        except FileNotFoundError:
+            with open(name, 'rb') as file:
+                return file.read(), headers, 'identity'
+    except (OSError, ValueError):
+        # Not prerendered, or removed by a concurrent build
+        return None
+
+
+# --- Rendering ---
+
+_handler = None
+
+
+def get_handler():
+    """A request handler running the project's full middleware stack."""
+    global _handler
+    if _handler is None:
+        handler = BaseHandler()
+        handler.load_middleware()
+        _handler = handler
+    return _handler
+
+
+def render_page(path):
+    """Render `path` (and its query string, if any) in-process as an anonymous HTTPS GET."""
+    host = settings.PRERENDER_HOST
+    path, _, query = path.partition('?')
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'SCRIPT_NAME': '',
+        'QUERY_STRING': query,
+        'SERVER_NAME': host,
+        'SERVER_PORT': '443',
+        'HTTP_HOST': host,
+        'HTTP_ACCEPT_ENCODING': 'identity',
+        'HTTP_X_FORWARDED_PROTO': 'https',
+        PRERENDER_HEADER: '1',
+        'wsgi.url_scheme': 'https',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+    }
+    return get_handler().get_response(WSGIRequest(environ))
+
+
+def write_atomic(name, data):
+    tmp = f'{name}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp, 'wb') as file:
+        file.write(data)
+    os.replace(tmp, name)
+
+
+def remove_page(build, path):
+    name = page_file(build, path)
+    for suffix in [HEADERS_SUFFIX, *ENCODING_SUFFIXES.values()]:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(name + suffix)
+
+
+def build_page(build, path):
+    """
+    Render `path` into `build`. Returns True if it was written; pages that
+    are missing, fail or depend on the visitor are removed instead, so
+    Django keeps serving them.
+    """
+    from .middleware import compress_variants, is_html, is_shareable_response
+
+    response = render_page(path)
+    if response.status_code != 200 or not is_html(response) or not is_shareable_response(response):
+        if response.status_code != 404:
+            logger.warning('Not prerendering %s: status %s', path, response.status_code)
+        remove_page(build, path)
+        return False
+    headers = {
+        name: value for name, value in response.items()
+        if name.lower() not in REQUEST_HEADERS
+    }
+    name = page_file(build, path)
+    os.makedirs(os.path.dirname(name), exist_ok=True)
+    for encoding, body in compress_variants(response.content).items():
+        write_atomic(name + ENCODING_SUFFIXES[encoding], body)
+    # Headers last: a page is only served once they exist
+    write_atomic(name + HEADERS_SUFFIX, json.dumps(headers).encode())
+    return True
+
+
+def build_pages(build, paths):
+    return sum(build_page(build, path) for path in paths)
+
+
+# --- What to render ---
+
+def product_path(slug):
+    return reverse('product_detail', args=[slug])
+
+
+def all_paths():
+    paths = [reverse(name) for name in PRERENDER_URL_NAMES]
+    paths += [product_path(slug) for slug in Product.objects.values_list('slug', flat=True).iterator()]
+    return paths
+
+
+def newest_by_category():
+    """Primary keys of the RELATED_WINDOW newest available products per category."""
+    return {
+        category: list(
+            Product.objects.filter(category=category, is_available=True)
+            .order_by('-created_at').values_list('pk', flat=True)[:RELATED_WINDOW]
+        )
+        for category, _ in Product.CATEGORY_CHOICES
+    }
+
+
+def affected_paths(entries, previous_newest):
+    """
+    Pages to re-render for journal entries, plus the newest products per
+    category afterwards. A product edit touches its own page and the
+    collection; it touches every product page of a category only when it is
+    (or was) among the products their "Similar Styles" section shows.
+    """
+    paths = set()
+    products = set()
+    for entry in entries:
+        kind, _, value = entry.partition(' ')
+        if kind == 'page':
+            paths.add(value)
+        elif kind == 'product':
+            pk, _, slug = value.partition(' ')
+            products.add(int(pk))
+            paths.update([product_path(slug), reverse('collection')])
+
+    newest = newest_by_category()
+    for category, pks in newest.items():
+        shown = set(pks) | set(previous_newest.get(category, []))
+        if products & shown:
+            paths.update(
+                product_path(slug) for slug in
+                Product.objects.filter(category=category).values_list('slug', flat=True).iterator()
+            )
+    return sorted(paths), newest
+
+
+# --- Builds ---
+
+@contextlib.contextmanager
+def build_lock():
+    """Hold the host-wide build lock (a no-op where flock doesn't exist)."""
+    os.makedirs(prerender_root(), exist_ok=True)
+    with open(os.path.join(prerender_root(), LOCK_NAME), 'a') as handle:
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        yield
+
+
+def write_build_info(build, offset, newest, pages):
+    write_atomic(os.path.join(build, MANIFEST_NAME), json.dumps({
+        'built_at': time.time(),
+        'pages': pages,
+        'newest': newest,
+    }).encode())
+    write_atomic(os.path.join(build, STAMP_NAME), str(offset).encode())
+
+
+def read_manifest(build):
+    with open(os.path.join(build, MANIFEST_NAME)) as file:
+        return json.load(file)
+
+
+def _chunks(items, count):
+    return [items[index::count] for index in range(count)]
+
+
+def full_build(workers=None):
+    """
+    Render every page into a new build, in parallel across `workers`
+    processes, and make it current. Returns (pages written, seconds).
+    """
+    started = time.perf_counter()
+    root = prerender_root()
+    workers = workers or os.cpu_count() or 1
+    with build_lock():
+        offset = journal_size()
+        paths = all_paths()
+        newest = newest_by_category()
+        build_id = f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}'
+        build = os.path.join(root, BUILDS_DIR, build_id)
+        os.makedirs(build)
+        if workers == 1:
+            pages = build_pages(build, paths)
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+
+            # Forked workers must open their own connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pages = sum(pool.map(build_pages, [build] * workers, _chunks(paths, workers)))
+        write_build_info(build, offset, newest, pages)
+        swap_current(build_id)
+        remove_old_builds(build_id)
+    return pages, time.perf_counter() - started
+
+
+def swap_current(build_id):
+    """Point `current` at the new build in a single atomic rename."""
+    root = prerender_root()
+    tmp = os.path.join(root, f'{CURRENT_NAME}.{os.getpid()}.tmp')
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(tmp)
+    os.symlink(os.path.join(BUILDS_DIR, build_id), tmp)
+    os.replace(tmp, os.path.join(root, CURRENT_NAME))
+
+
+def remove_old_builds(keep):
+    builds_dir = os.path.join(prerender_root(), BUILDS_DIR)
+    old = sorted(name for name in os.listdir(builds_dir) if name != keep)
+    for name in old[:max(0, len(old) - KEEP_PREVIOUS_BUILDS)]:
+        shutil.rmtree(os.path.join(builds_dir, name), ignore_errors=True)
+
+
+def apply_journal():
+    """
+    Re-render the pages affected by edits the current build doesn't cover
+    yet. Returns (pages rendered, seconds).
+    """
+    started = time.perf_counter()
+    with build_lock():
+        build = current_build()
+        if build is None:
+            return 0, 0.0
+        start = read_stamp(build) or 0
+        end = journal_size()
+        if end <= start:
+            return 0, time.perf_counter() - started
+        with open(os.path.join(prerender_root(), JOURNAL_NAME), 'rb') as file:
+            file.seek(start)
+            entries = file.read(end - start).decode().splitlines()
+        manifest = read_manifest(build)
+        paths, newest = affected_paths(entries, manifest['newest'])
+        build_pages(build, paths)
+        write_build_info(build, end, newest, manifest['pages'])
+    return len(paths), time.perf_counter() - started
+
+
+def record_edits(entries):
+    """
+    Append committed edits to the journal. Appends are atomic, so several
+    workers may record at once; from now on the current build isn't served
+    until apply_journal() catches up.
+    """
+    data = ''.join(f'{entry}\n' for entry in entries).encode()
+    fd = os.open(os.path.join(prerender_root(), JOURNAL_NAME), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+
+
+class Regenerator:
+    """Debounces edits into one apply_journal() run PRERENDER_DELAY seconds later."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def schedule(self):
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(settings.PRERENDER_DELAY, self._run_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def cancel(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def run(self):
+        self.cancel()
+        try:
+            return apply_journal()
+        except Exception:
+            logger.exception('Prerender regeneration failed; pages are served by Django until the next build')
+            return 0, 0.0
+
+    def _run_from_timer(self):
+        # Timer threads get their own DB connection; don't leak it
+        try:
+            self.run()
+        finally:
+            close_old_connections()
+
+
+regenerator = Regenerator()
+
+
+def on_edit(entries, wait=False):
+    """
+    Record committed edits and regenerate their pages: in the background
+    after PRERENDER_DELAY, or right away with `wait` (management commands).
+    """
+    if not is_enabled():
+        return
+    record_edits(entries)
+    if wait:
+        regenerator.run()
+    else:
+        regenerator.schedule()
@@ -0,0 +1,116 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from .metrics import registry
+
+# The RequestProfile of the request being served, if profiling is on. Like
+# read_from_replica it follows the request into sync_to_async threads.
+current_profile = ContextVar('current_profile', default=None)
+
+# Cap the SQL kept per request so a runaway N+1 can't eat memory
+MAX_CAPTURED_QUERIES = 200
+
+
+class RequestProfile:
+    """Costs accumulated while serving one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.sql = []
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.uploads = 0
+        self.upload_time = 0.0
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Value for the Server-Timing response header (durations in ms)."""
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f};desc="templates"',
+            f'cache;desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+            f'upload;dur={self.upload_time * 1000:.1f};desc="{self.uploads} uploads"',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ])
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 2),
+            'template_ms': round(self.template_time * 1000, 2),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'uploads': self.uploads,
+            'upload_ms': round(self.upload_time * 1000, 2),
+            'total_ms': round(self.total_time * 1000, 2),
+        }
+
+
+def record_cache(hit):
+    """Count a cache lookup against the current request."""
+    profile = current_profile.get()
+    if profile is not None:
+        if hit:
+            profile.cache_hits += 1
+        else:
+            profile.cache_misses += 1
+
+
+@contextmanager
+def record_upload():
+    """Time an external upload (Cloudinary) against the current request."""
+    profile = current_profile.get()
+    registry.add_gauge('fashion_media_uploads_in_progress', 1)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.add_gauge('fashion_media_uploads_in_progress', -1)
+        if profile is not None:
+            profile.uploads += 1
+            profile.upload_time += time.perf_counter() - started
+
+
+def query_timer(execute, sql, params, many, context):
+    """Connection execute_wrapper that counts and times every query."""
+    profile = current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        profile.queries += 1
+        profile.db_time += duration
+        if len(profile.sql) < MAX_CAPTURED_QUERIES:
+            profile.sql.append((round(duration * 1000, 2), sql))
+
+
+def instrument_templates():
+    """Wrap Django template rendering so its time is charged to the request."""
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, 'profiled', False):
+        return
+    original_render = Template.render
+
+    def render(self, context=None, request=None):
+        profile = current_profile.get()
+        if profile is None:
+            return original_render(self, context, request)
+        started = time.perf_counter()
+        try:
+            return original_render(self, context, request)
+        finally:
+            profile.template_time += time.perf_counter() - started
+
+    render.profiled = True
+    Template.render = render
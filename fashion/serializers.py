@@ -9,4 +9,5 @@ class ProductSerializer(serializers.ModelSerializer):
 class ContactMessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = ContactMessage
-        fields = "__all__"
\ No newline at end of file
+        fields = "__all__"
+        read_only_fields = ["created_at", "is_read", "handled_at"]
\ No newline at end of file
@@ -0,0 +1,63 @@
+"""
+Offline support: the service worker script and what it precaches.
+
+The worker is rendered from templates/fashion/sw.js with the hashed URLs of
+the static manifest, once by collectstatic (see fashion.storage) and, when
+no collected copy exists (development), on demand by the sw.js view. Its
+cache version is a hash of its own source and everything it precaches, so a
+deploy that changes any shell asset installs a new worker, which evicts the
+old caches.
+"""
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.template.loader import get_template
+from django.urls import reverse
+
+SERVICE_WORKER_NAME = 'sw.js'
+
+# Static files of the app shell, by their unhashed names
+PRECACHE_STATIC = [
+    'fashion/images/favicon-16x16.png',
+    'fashion/images/favicon-32x32.png',
+    'fashion/images/apple-touch-icon.png',
+]
+
+# Third-party scripts and stylesheets every page loads
+PRECACHE_EXTERNAL = [
+    'https://cdn.tailwindcss.com',
+    'https://unpkg.com/lucide@latest',
+    'https://fonts.googleapis.com/css2?family=Playfair+Display:ital,wght@0,400;0,500;0,600;0,700;1,400;1,500&family=Inter:wght@300;400;500;600;700&display=swap',
+]
+
+# Pages precached so the site opens offline
+PRECACHE_URL_NAMES = ['offline', 'home', 'collection']
+
+
+def precache_assets(storage):
+    """Shell assets cached at install time, static ones hashed by `storage`."""
+    return [storage.url(name) for name in PRECACHE_STATIC] + PRECACHE_EXTERNAL
+
+
+def build_service_worker(storage):
+    """Source of the service worker for the static files in `storage`."""
+    template = get_template('fashion/sw.js')
+    assets = precache_assets(storage)
+    pages = [reverse(name) for name in PRECACHE_URL_NAMES]
+    version = hashlib.sha256(
+        json.dumps([assets, pages, template.template.source]).encode()
+    ).hexdigest()[:12]
+    return template.render({
+        'version': version,
+        'precache_assets': json.dumps(assets),
+        'precache_pages': json.dumps(pages),
+        'static_url': json.dumps(settings.STATIC_URL),
+        'media_url': json.dumps(settings.MEDIA_URL),
+        'offline_url': json.dumps(reverse('offline')),
+        'products_api_url': json.dumps(reverse('api-product-list')),
+        # "/img/" of /img/<id>/<width>.<fmt>
+        'image_proxy_url': json.dumps(reverse('product_image', args=[0, 0, 'auto']).rsplit('/', 2)[0] + '/'),
+        'max_images': settings.SERVICE_WORKER_MAX_IMAGES,
+    })
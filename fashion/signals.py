@@ -0,0 +1,71 @@
+from django.db.backends.signals import connection_created
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.urls import reverse
+
+from .cache import bump_catalogue_generation
+from .models import AboutContent, Product
+from .prerender import on_edit
+from .warming import on_edit as rewarm_on_edit, product_paths
+from .profiling import query_timer
+from .routers import pin_primary_reads
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=AboutContent)
+@receiver(post_delete, sender=AboutContent)
+def invalidate_storefront(sender, **kwargs):
+    """
+    Any catalogue or About page edit makes cached storefront pages stale.
+    Bumped again on commit: a request in between still reads the old row and
+    may have cached it under the first new generation.
+    """
+    bump_catalogue_generation()
+    transaction.on_commit(bump_catalogue_generation)
+    pin_primary_reads()
+
+
+@receiver(post_save, sender=AboutContent)
+@receiver(post_delete, sender=AboutContent)
+def invalidate_about_content(sender, **kwargs):
+    """Drop the cached singleton once the change is committed."""
+    transaction.on_commit(lambda: cache.delete(AboutContent.CACHE_KEY))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def regenerate_product_pages(sender, instance, **kwargs):
+    """Re-render the prerendered pages showing this product once the edit is committed."""
+    entries = [f'product {instance.pk} {instance.slug}']
+    stored_slug = getattr(instance, '_stored_slug', None)
+    if stored_slug and stored_slug != instance.slug:
+        # The old URL now 404s, which removes its prerendered file
+        entries.append(f'product {instance.pk} {stored_slug}')
+    instance._stored_slug = instance.slug
+    transaction.on_commit(lambda: on_edit(entries))
+
+
+@receiver(post_save, sender=AboutContent)
+@receiver(post_delete, sender=AboutContent)
+def regenerate_about_page(sender, **kwargs):
+    transaction.on_commit(lambda: on_edit([f"page {reverse('about')}"]))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=AboutContent)
+@receiver(post_delete, sender=AboutContent)
+def rewarm_storefront(sender, instance, signal, **kwargs):
+    """Re-fill the caches the edit invalidated, the saved product's page included."""
+    paths = product_paths(instance) if sender is Product and signal is post_save else []
+    transaction.on_commit(lambda: rewarm_on_edit(paths))
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """Time every query on every connection for ProfilingMiddleware."""
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_timer)
@@ -0,0 +1,30 @@
+from django.core.files.base import ContentFile
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+from .serviceworker import SERVICE_WORKER_NAME, build_service_worker
+
+
+class ServiceWorkerStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """
+    WhiteNoise's hashed, compressed static storage that also writes the
+    service worker once collectstatic has built the manifest.
+    """
+
+    # Fall back to unhashed URLs when the manifest is missing (tests, before
+    # the first collectstatic) instead of failing the page
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # Not collected, so there's no file to hash either
+            return name
+
+    def post_process(self, *args, **kwargs):
+        yield from super().post_process(*args, **kwargs)
+        if not kwargs.get('dry_run'):
+            if self.exists(SERVICE_WORKER_NAME):
+                self.delete(SERVICE_WORKER_NAME)
+            self.save(SERVICE_WORKER_NAME, ContentFile(build_service_worker(self).encode()))
+            yield SERVICE_WORKER_NAME, SERVICE_WORKER_NAME, True
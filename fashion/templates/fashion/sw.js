@@ -0,0 +1,164 @@
+{% autoescape off %}// DOMEMILY service worker, generated by collectstatic (fashion/serviceworker.py)
+const VERSION = '{{ version }}';
+const SHELL_CACHE = `domemily-shell-${VERSION}`;
+const PAGES_CACHE = `domemily-pages-${VERSION}`;
+const IMAGES_CACHE = `domemily-images-${VERSION}`;
+const CACHES = [SHELL_CACHE, PAGES_CACHE, IMAGES_CACHE];
+
+const PRECACHE_ASSETS = {{ precache_assets }};
+const PRECACHE_PAGES = {{ precache_pages }};
+const STATIC_URL = {{ static_url }};
+const MEDIA_URL = {{ media_url }};
+const OFFLINE_URL = {{ offline_url }};
+const PRODUCTS_API_URL = {{ products_api_url }};
+const IMAGE_PROXY_URL = {{ image_proxy_url }};
+const MAX_IMAGES = {{ max_images }};
+
+// Collected static files carry a content hash: style.3f2a9c81d4e0.css
+const FINGERPRINTED = /\.[0-9a-f]{12}\.[a-z0-9]+$/;
+const IMAGE_HOSTS = ['res.cloudinary.com'];
+const FONT_HOSTS = ['fonts.googleapis.com', 'fonts.gstatic.com'];
+const SHELL_URLS = new Set(PRECACHE_ASSETS.map((url) => new URL(url, self.location).href));
+// Never cached: forms, the dashboard and admin, probes
+const BYPASS = [/^\/admin\//, /^\/dashboard\//, /^\/api\/contact\//, /^\/metrics/, /^\/healthz\//, /^\/readyz\//];
+
+async function precache(cacheName, urls) {
+    const cache = await caches.open(cacheName);
+    // One unreachable CDN must not fail the whole install
+    await Promise.all(urls.map(async (url) => {
+        const sameOrigin = new URL(url, self.location).origin === self.location.origin;
+        try {
+            const response = await fetch(new Request(url, { mode: sameOrigin ? 'same-origin' : 'no-cors' }));
+            if (response.ok || response.type === 'opaque') {
+                await cache.put(url, response);
+            }
+        } catch (error) {
+            // Offline during install; fetched at runtime instead
+        }
+    }));
+}
+
+self.addEventListener('install', (event) => {
+    event.waitUntil(Promise.all([
+        precache(SHELL_CACHE, PRECACHE_ASSETS),
+        precache(PAGES_CACHE, PRECACHE_PAGES),
+    ]).then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', (event) => {
+    // Evict every cache of older versions
+    event.waitUntil(
+        caches.keys()
+            .then((names) => Promise.all(
+                names.filter((name) => name.startsWith('domemily-') && !CACHES.includes(name))
+                    .map((name) => caches.delete(name))
+            ))
+            .then(() => self.clients.claim())
+    );
+});
+
+async function trimCache(cacheName, maxEntries) {
+    const cache = await caches.open(cacheName);
+    const keys = await cache.keys();
+    // Keys come back in insertion order: drop the oldest
+    await Promise.all(keys.slice(0, Math.max(0, keys.length - maxEntries)).map((key) => cache.delete(key)));
+}
+
+async function remember(cacheName, request, response) {
+    const cache = await caches.open(cacheName);
+    await cache.put(request, response);
+    if (cacheName === IMAGES_CACHE) {
+        trimCache(IMAGES_CACHE, MAX_IMAGES);
+    }
+}
+
+async function cacheFirst(request, cacheName) {
+    const cached = await caches.match(request);
+    if (cached) {
+        return cached;
+    }
+    const response = await fetch(request);
+    if (response.ok || response.type === 'opaque') {
+        await remember(cacheName, request, response.clone());
+    }
+    return response;
+}
+
+async function staleWhileRevalidate(event, cacheName) {
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(event.request);
+    const network = fetch(event.request).then(async (response) => {
+        if (response.ok) {
+            await remember(cacheName, event.request, response.clone());
+        }
+        return response;
+    });
+    if (cached) {
+        // Serve the cached copy now, refresh it for next time
+        event.waitUntil(network.catch(() => undefined));
+        return cached;
+    }
+    return network;
+}
+
+async function networkFirst(request, cacheName) {
+    const cache = await caches.open(cacheName);
+    try {
+        const response = await fetch(request);
+        if (response.ok) {
+            await cache.put(request, response.clone());
+        }
+        return response;
+    } catch (error) {
+        return (await cache.match(request)) || (await caches.match(OFFLINE_URL));
+    }
+}
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    if (request.method !== 'GET') {
+        return;
+    }
+    const url = new URL(request.url);
+    const sameOrigin = url.origin === self.location.origin;
+
+    if (sameOrigin && BYPASS.some((pattern) => pattern.test(url.pathname))) {
+        return;
+    }
+
+    if (request.mode === 'navigate') {
+        if (PRECACHE_PAGES.includes(url.pathname)) {
+            // Show the home page and catalogue instantly, update them in the background
+            event.respondWith(staleWhileRevalidate(event, PAGES_CACHE).catch(() => caches.match(OFFLINE_URL)));
+        } else {
+            event.respondWith(networkFirst(request, PAGES_CACHE));
+        }
+        return;
+    }
+
+    if (sameOrigin && url.pathname === PRODUCTS_API_URL) {
+        event.respondWith(staleWhileRevalidate(event, PAGES_CACHE));
+        return;
+    }
+
+    if (sameOrigin && url.pathname.startsWith(STATIC_URL) && FINGERPRINTED.test(url.pathname)) {
+        event.respondWith(cacheFirst(request, SHELL_CACHE));
+        return;
+    }
+
+    // Uploaded, resized and Cloudinary images, trimmed to MAX_IMAGES. Our own
+    // are refreshed in the background so a replaced image shows on the next
+    // visit; Cloudinary URLs carry a version of their own.
+    const isOwnImage = sameOrigin && (url.pathname.startsWith(MEDIA_URL) || url.pathname.startsWith(IMAGE_PROXY_URL));
+    if (isOwnImage || (!sameOrigin && IMAGE_HOSTS.includes(url.hostname))) {
+        if (request.destination === 'image') {
+            event.respondWith(isOwnImage ? staleWhileRevalidate(event, IMAGES_CACHE) : cacheFirst(request, IMAGES_CACHE));
+        }
+        return;
+    }
+
+    if (FONT_HOSTS.includes(url.hostname) || SHELL_URLS.has(request.url)) {
+        event.respondWith(staleWhileRevalidate(event, SHELL_CACHE));
+    }
+});
+{% endautoescape %}
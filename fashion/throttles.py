@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+
+class ContactTokenBucketThrottle(BaseThrottle):
+    """
+    Per-IP token bucket kept in the cache, so all workers share it when the
+    cache backend is shared. A client may send CONTACT_THROTTLE_BURST messages
+    at once, then CONTACT_THROTTLE_RATE per minute.
+
+    The read-modify-write isn't atomic; two racing requests can both spend
+    the last token. That only loosens the limit by a message or two.
+
+    Clients are told apart by get_ident(), which only trusts the last
+    REST_FRAMEWORK['NUM_PROXIES'] X-Forwarded-For entries (see settings).
+    """
+
+    cache_prefix = 'fashion:contact-bucket'
+
+    def allow_request(self, request, view):
+        capacity = settings.CONTACT_THROTTLE_BURST
+        refill_per_second = settings.CONTACT_THROTTLE_RATE / 60
+        key = f'{self.cache_prefix}:{self.get_ident(request)}'
+        now = time.time()
+
+        tokens, updated = cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * refill_per_second)
+        if tokens < 1:
+            self.retry_after = (1 - tokens) / refill_per_second
+            return False
+
+        # Keep the bucket until it would have refilled completely anyway
+        cache.set(key, (tokens - 1, now), timeout=int(capacity / refill_per_second) + 1)
+        return True
+
+    def wait(self):
+        return getattr(self, 'retry_after', None)
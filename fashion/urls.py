@@ -1,6 +1,29 @@
+import functools
+
 from django.urls import path
+from django.utils.module_loading import import_string
+from django.views.decorators.csrf import csrf_exempt
+
 from . import views
 
+
+@functools.cache
+def _api_view(name):
+    return import_string(f'fashion.api.{name}').as_view()
+
+
+def lazy_api_view(name):
+    """
+    Route to a DRF view in fashion.api, importing DRF on the first API
+    request instead of at startup.
+    """
+    # Exempt like APIView.as_view(); DRF runs its own CSRF check for sessions
+    @csrf_exempt
+    def view(request, *args, **kwargs):
+        return _api_view(name)(request, *args, **kwargs)
+    return view
+
+
 urlpatterns = [
     # Pages
     path('', views.home, name='home'),
@@ -8,6 +31,19 @@ urlpatterns = [
     path('about/', views.about, name='about'),
     path('contact/', views.contact, name='contact'),
     path('product/<slug:slug>/', views.product_detail, name='product_detail'),
+    path('offline/', views.offline, name='offline'),
+
+    # Resized product images, e.g. /img/12/400.webp or /img/12/800.auto
+    path('img/<int:product_id>/<int:width>.<str:fmt>', views.product_image, name='product_image'),
+
+    # Sitemap and product feed for crawlers and marketplaces
+    path('sitemap.xml', views.sitemap, name='sitemap'),
+    path('sitemap-<int:page>.xml', views.sitemap_page, name='sitemap_page'),
+    path('feeds/products.json', views.product_feed, {'fmt': 'json'}, name='product_feed_json'),
+    path('feeds/products.xml', views.product_feed, {'fmt': 'xml'}, name='product_feed_xml'),
+
+    # Service worker (must live at the root to control every page)
+    path('sw.js', views.service_worker, name='service_worker'),
     
     # Dashboard
     path('dashboard/upload-dress/', views.upload_dress, name='upload_dress'),
@@ -17,7 +53,12 @@ urlpatterns = [
     path('dashboard/delete-dress/<int:product_id>/', views.delete_dress, name='delete_dress'),
     path('dashboard/edit-about/', views.edit_about, name='edit_about'), # <--- NEW LINK
 
+    # Health checks (load balancer / App Platform probes)
+    path('healthz/', views.healthz, name='healthz'),
+    path('readyz/', views.readyz, name='readyz'),
+    path('metrics', views.metrics, name='metrics'),
+
     # API
-    path('api/products/', views.ProductListAPIView.as_view(), name='api-product-list'),
-    path('api/contact/', views.ContactCreateAPIView.as_view(), name='api-contact-create'),
+    path('api/products/', lazy_api_view('ProductListAPIView'), name='api-product-list'),
+    path('api/contact/', lazy_api_view('ContactCreateAPIView'), name='api-contact-create'),
 ]
\ No newline at end of file
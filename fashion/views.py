@@ -1,23 +1,47 @@
-from django.shortcuts import render, get_object_or_404, redirect
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
 from django.contrib import messages
 from django.conf import settings
-from rest_framework import generics
-from .models import Product, ContactMessage, AboutContent
-from .serializers import ProductSerializer, ContactMessageSerializer
-import os
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Q
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseNotModified, JsonResponse,
+)
+from django.utils.cache import patch_vary_headers
+from asgiref.sync import sync_to_async
+from .models import Product, AboutContent
+from .profiling import record_upload
+from .metrics import collect, render_prometheus
+from .popularity import aprefetch_context
+from .feeds import (
+    FEED_CONTENT_TYPES, FEED_RETRY_AFTER, PRODUCT_FEEDS, SITEMAP_CONTENT_TYPE, feed_cache_path, open_or_build,
+    site_url, sitemap_index, sitemap_page_exists, sitemap_urlset,
+)
+from .middleware import negotiate_encoding
+from .images import RESIZE_FORMATS, image_metadata, image_version
+from .imageproxy import AUTO_FORMAT, content_type, image_proxy, image_source, negotiate_format, variant_key
+from .serviceworker import SERVICE_WORKER_NAME, build_service_worker
+import functools
+import hmac
+import importlib.util
+import ipaddress
+import logging
 
-# Try to import cloudinary (may fail if not configured)
-try:
+logger = logging.getLogger(__name__)
+
+# Cloudinary is used when configured and installed. The SDK is slow to
+# import, so it's only loaded by the first upload.
+CLOUDINARY_ENABLED = bool(settings.CLOUDINARY_URL) and importlib.util.find_spec('cloudinary') is not None
+
+
+@functools.cache
+def cloudinary_uploader():
+    """The configured cloudinary.uploader module, imported on first use."""
     import cloudinary
     import cloudinary.uploader
-    CLOUDINARY_URL = os.getenv('CLOUDINARY_URL')
-    if CLOUDINARY_URL:
-        cloudinary.config(cloudinary_url=CLOUDINARY_URL)
-        CLOUDINARY_ENABLED = True
-    else:
-        CLOUDINARY_ENABLED = False
-except ImportError:
-    CLOUDINARY_ENABLED = False
+    cloudinary.config(cloudinary_url=settings.CLOUDINARY_URL)
+    return cloudinary.uploader
 
 
 def upload_to_cloudinary(file, folder="domemily/products", resource_type="image"):
@@ -29,61 +53,96 @@ def upload_to_cloudinary(file, folder="domemily/products", resource_type="image"
         return None
     try:
         # We must specify resource_type for videos
-        result = cloudinary.uploader.upload(file, folder=folder, resource_type=resource_type)
+        with record_upload():
+            result = cloudinary_uploader().upload(file, folder=folder, resource_type=resource_type)
         return result.get('secure_url')
     except Exception as e:
-        print(f"Cloudinary upload error: {e}")
+        logger.error(f"Cloudinary upload error: {e}")
         return None
 
 
-def home(request):
+async def aupload_to_cloudinary(file, folder="domemily/products", resource_type="image"):
+    """
+    Async wrapper around upload_to_cloudinary.
+    The blocking HTTP upload runs in a worker thread so it never stalls the event loop.
+    """
+    return await sync_to_async(upload_to_cloudinary, thread_sensitive=False)(
+        file, folder=folder, resource_type=resource_type
+    )
+
+
+async def aimage_metadata(file):
+    """Dimensions, colour and placeholder of an upload, decoded off the event loop."""
+    return await sync_to_async(image_metadata, thread_sensitive=False)(file)
+
+
+# Storefront views are async so that, when served over ASGI, a slow client or
+# query doesn't pin a worker. Querysets are evaluated here with the async ORM
+# because templates can't run lazy queries inside the event loop.
+
+async def home(request):
     """Landing page view."""
     return render(request, "fashion/home.html")
 
 
-def collection(request):
+async def collection(request):
     """View for the dedicated collection page."""
-    products = Product.objects.filter(is_available=True).order_by('-created_at')
+    products = [
+        product async for product in
+        Product.objects.filter(is_available=True).order_by('-created_at')
+    ]
     return render(request, "fashion/collection.html", {
-        "products": products
+        "products": products,
+        "prefetch": await aprefetch_context([product.slug for product in products]),
     })
 
 
-def about(request):
+async def about(request):
     """About page with dynamic content."""
-    content = AboutContent.objects.first()
+    content = await AboutContent.aload()
     return render(request, "fashion/about.html", {
         "content": content
     })
 
 
-def contact(request):
+async def contact(request):
     return render(request, "fashion/contact.html")
 
 
-def product_detail(request, slug):
+async def offline(request):
+    """Fallback page the service worker shows when a page isn't cached and the network is down."""
+    return render(request, "fashion/offline.html")
+
+
+async def product_detail(request, slug):
     """View for individual product detail page."""
-    product = get_object_or_404(Product, slug=slug)
+    product = await aget_object_or_404(Product, slug=slug)
     
     # Get related products (same category, excluding current product)
-    related_products = Product.objects.filter(
-        category=product.category,
-        is_available=True
-    ).exclude(id=product.id).order_by('-created_at')[:4]
+    related_products = [
+        related async for related in Product.objects.filter(
+            category=product.category,
+            is_available=True
+        ).exclude(id=product.id).order_by('-created_at')[:4]
+    ]
     
     return render(request, "fashion/product_detail.html", {
         "product": product,
-        "related_products": related_products
+        "related_products": related_products,
+        "prefetch": await aprefetch_context([related.slug for related in related_products]),
     })
 
 
 # --- DASHBOARD & MANAGEMENT VIEWS ---
 
-def upload_dress(request):
+async def upload_dress(request):
     """View for uploading new dresses."""
     context = {
         'dress_types': Product.DRESS_TYPE_CHOICES,
-        'recent_products': Product.objects.filter(category='dresses').order_by('-created_at')[:4],
+        'recent_products': [
+            product async for product in
+            Product.objects.filter(category='dresses').order_by('-created_at')[:4]
+        ],
         'form_data': {},
     }
     
@@ -129,13 +188,15 @@ def upload_dress(request):
         else:
             # 1. Handle Image
             image_url = None
+            image_meta = {}
             if image_file:
-                image_url = upload_to_cloudinary(image_file, resource_type="image")
+                image_meta = await aimage_metadata(image_file)
+                image_url = await aupload_to_cloudinary(image_file, resource_type="image")
             
             # 2. Handle Video
             video_url = None
             if video_file:
-                video_url = upload_to_cloudinary(video_file, resource_type="video")
+                video_url = await aupload_to_cloudinary(video_file, resource_type="video")
             
             # Create Product
             product = Product(
@@ -148,6 +209,7 @@ def upload_dress(request):
                 # Image Logic
                 image_url=image_url if image_url else "",
                 image=None if image_url else image_file,
+                image_meta=image_meta,
                 
                 # Video Logic
                 video_url=video_url if video_url else "",
@@ -155,7 +217,9 @@ def upload_dress(request):
                 
                 is_available=is_available,
             )
-            product.save()
+            if product.image:
+                await sync_to_async(product.build_thumbnails, thread_sensitive=False)()
+            await product.asave()
             
             messages.success(request, f'"{name}" has been uploaded successfully!')
             return redirect('manage_dresses')
@@ -179,24 +243,26 @@ def manage_dresses(request):
     if search_query:
         products = products.filter(name__icontains=search_query)
     
-    # Counts for filter tabs
-    all_dresses = Product.objects.filter(category='dresses')
+    # Counts for filter tabs (one aggregate query instead of three COUNTs)
+    counts = Product.objects.filter(category='dresses').aggregate(
+        all_count=Count('id'),
+        available_count=Count('id', filter=Q(is_available=True)),
+        hidden_count=Count('id', filter=Q(is_available=False)),
+    )
     
     context = {
         'products': products,
         'current_filter': current_filter,
         'search_query': search_query,
-        'all_count': all_dresses.count(),
-        'available_count': all_dresses.filter(is_available=True).count(),
-        'hidden_count': all_dresses.filter(is_available=False).count(),
+        **counts,
     }
     
     return render(request, "fashion/manage_dresses.html", context)
 
 
-def edit_dress(request, product_id):
+async def edit_dress(request, product_id):
     """View for editing a dress."""
-    product = get_object_or_404(Product, id=product_id, category='dresses')
+    product = await aget_object_or_404(Product, id=product_id, category='dresses')
     
     context = {
         'product': product,
@@ -232,17 +298,19 @@ def edit_dress(request, product_id):
             
             # Update Image
             if image_file:
-                image_url = upload_to_cloudinary(image_file, resource_type="image")
+                product.image_meta = await aimage_metadata(image_file)
+                image_url = await aupload_to_cloudinary(image_file, resource_type="image")
                 if image_url:
                     product.image_url = image_url
                     product.image = None
                 else:
                     product.image = image_file
                     product.image_url = ""
+                    await sync_to_async(product.build_thumbnails, thread_sensitive=False)()
             
             # Update Video
             if video_file:
-                video_url = upload_to_cloudinary(video_file, resource_type="video")
+                video_url = await aupload_to_cloudinary(video_file, resource_type="video")
                 if video_url:
                     product.video_url = video_url
                     product.video = None
@@ -250,26 +318,24 @@ def edit_dress(request, product_id):
                     product.video = video_file
                     product.video_url = ""
             
-            product.save()
+            await product.asave()
             context['success'] = True
             context['product'] = product
     
     return render(request, "fashion/edit_dress.html", context)
 
 
-def edit_about(request):
+async def edit_about(request):
     """View to manage About Page content (Founder & Studio images)."""
-    content = AboutContent.objects.first()
-    if not content:
-        content = AboutContent()
-        content.save()
+    content = await AboutContent.aload()
     
     if request.method == 'POST':
         founder_file = request.FILES.get('founder_image')
         studio_file = request.FILES.get('studio_image')
         
         if founder_file:
-            url = upload_to_cloudinary(founder_file, folder="domemily/about", resource_type="image")
+            content.founder_image_meta = await aimage_metadata(founder_file)
+            url = await aupload_to_cloudinary(founder_file, folder="domemily/about", resource_type="image")
             if url:
                 content.founder_image_url = url
                 content.founder_image = None
@@ -278,7 +344,8 @@ def edit_about(request):
                 content.founder_image_url = ""
         
         if studio_file:
-            url = upload_to_cloudinary(studio_file, folder="domemily/about", resource_type="image")
+            content.studio_image_meta = await aimage_metadata(studio_file)
+            url = await aupload_to_cloudinary(studio_file, folder="domemily/about", resource_type="image")
             if url:
                 content.studio_image_url = url
                 content.studio_image = None
@@ -286,7 +353,7 @@ def edit_about(request):
                 content.studio_image = studio_file
                 content.studio_image_url = ""
                 
-        content.save()
+        await content.asave()
         messages.success(request, 'About page content updated successfully!')
         return redirect('edit_about')
 
@@ -317,12 +384,174 @@ def delete_dress(request, product_id):
     return redirect('manage_dresses')
 
 
-# --- API VIEWS ---
+# --- SERVICE WORKER ---
+
+_service_worker_source = None
+
+
+def service_worker(request):
+    """
+    The service worker written by collectstatic, served from the site root so
+    it may control every page. Built on the fly when nothing was collected.
+    """
+    global _service_worker_source
+    source = _service_worker_source
+    if source is None:
+        if staticfiles_storage.exists(SERVICE_WORKER_NAME):
+            with staticfiles_storage.open(SERVICE_WORKER_NAME) as file:
+                source = file.read().decode()
+        else:
+            source = build_service_worker(staticfiles_storage)
+        if not settings.DEBUG:
+            _service_worker_source = source
+    response = HttpResponse(source, content_type='application/javascript; charset=utf-8')
+    # Browsers must revalidate so a deploy's new worker is picked up at once
+    response['Cache-Control'] = 'no-cache'
+    response['Service-Worker-Allowed'] = '/'
+    return response
+
+
+# --- SITEMAP & PRODUCT FEED ---
+
+def cached_feed(request, name, content_type, generate):
+    """
+    Serve `name` from the feed cache of the current catalogue generation,
+    writing generate(base_url) to it first on a miss (see fashion.feeds).
+    """
+    path = feed_cache_path(name)
+    gzipped = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', '')) != 'identity'
+    file, status = open_or_build(path, gzipped, lambda: generate(site_url()))
+    if file is None:
+        # The first copy is still being built: come back shortly rather than wait
+        response = HttpResponse('Feed is being built', status=503, content_type='text/plain')
+        response['Retry-After'] = str(FEED_RETRY_AFTER)
+        return response
+    response = FileResponse(file, content_type=content_type)
+    del response['Content-Disposition']
+    response['X-Feed-Cache'] = status
+    if gzipped:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+def sitemap(request):
+    """Sitemap index of the /sitemap-<n>.xml pages."""
+    return cached_feed(request, 'sitemap.xml', SITEMAP_CONTENT_TYPE, sitemap_index)
+
+
+def sitemap_page(request, page):
+    if not sitemap_page_exists(page):
+        raise Http404('No such sitemap page')
+    return cached_feed(
+        request, f'sitemap-{page}.xml', SITEMAP_CONTENT_TYPE,
+        lambda base_url: sitemap_urlset(base_url, page),
+    )
+
+
+def product_feed(request, fmt):
+    """Every available product for marketplaces, as JSON or RSS with Merchant Center fields."""
+    return cached_feed(request, f'products.{fmt}', FEED_CONTENT_TYPES[fmt], PRODUCT_FEEDS[fmt])
+
+
+# --- RESIZED IMAGES ---
+
+def product_image(request, product_id, width, fmt):
+    """
+    A product's image scaled to `width` as `fmt` (webp, jpg, png, or auto to
+    follow the Accept header), rendered once and then served from the disk
+    cache (see fashion.imageproxy). Only URLs carrying the current image's
+    version (Product.get_image_variant_url) are cached for long; anything
+    else is revalidated against the ETag soon after.
+    """
+    if width not in settings.IMAGE_PROXY_WIDTHS or fmt not in RESIZE_FORMATS and fmt != AUTO_FORMAT:
+        raise Http404('Unsupported image size or format')
+    source = image_source(product_id)
+    if source is None:
+        raise Http404('No such product image')
+    negotiated = fmt == AUTO_FORMAT
+    if negotiated:
+        fmt = negotiate_format(request.META.get('HTTP_ACCEPT', ''))
+
+    etag = f'"{variant_key(source["url"], width, fmt)}"'
+    if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+        response = HttpResponseNotModified()
+    else:
+        try:
+            file, status = image_proxy.variant(source, width, fmt)
+        except (OSError, ValueError) as error:
+            logger.warning('Could not resize image of product %s: %s', product_id, error)
+            return HttpResponse('Image origin unavailable', status=502, content_type='text/plain')
+        response = FileResponse(file, content_type=content_type(fmt))
+        response['X-Image-Cache'] = status
+    response['ETag'] = etag
+    if request.GET.get('v') == image_version(source['url']):
+        response['Cache-Control'] = f'public, max-age={settings.IMAGE_PROXY_MAX_AGE}, immutable'
+    else:
+        response['Cache-Control'] = f'public, max-age={settings.IMAGE_PROXY_UNVERSIONED_MAX_AGE}'
+    if negotiated:
+        patch_vary_headers(response, ['Accept'])
+    return response
+
+
+# --- HEALTH CHECKS ---
+
+def healthz(request):
+    """Liveness probe: the worker is up and serving requests."""
+    return JsonResponse({'status': 'ok'})
+
+
+def readyz(request):
+    """Readiness probe: the database and cache are reachable."""
+    # The probe is public: failures are logged, never shown
+    checks = {}
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        checks['database'] = 'ok'
+    except Exception:
+        logger.exception('Readiness check: database unreachable')
+        checks['database'] = 'error'
+    try:
+        cache.set('fashion:readyz', 1, 5)
+        checks['cache'] = 'ok'
+    except Exception:
+        logger.exception('Readiness check: cache unreachable')
+        checks['cache'] = 'error'
+
+    ready = all(value == 'ok' for value in checks.values())
+    return JsonResponse(
+        {'status': 'ok' if ready else 'unavailable', 'checks': checks},
+        status=200 if ready else 503,
+    )
+
+
+def metrics_allowed(request):
+    """
+    With METRICS_TOKEN set, the scraper must send it as a bearer token.
+    Without one, production only answers scrapes that reach the app directly
+    from a private address; anything relayed by the proxy carries
+    X-Forwarded-For and is refused.
+    """
+    token = settings.METRICS_TOKEN
+    if token:
+        return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if settings.DEBUG:
+        return True
+    if 'X-Forwarded-For' in request.headers:
+        return False
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return address.is_loopback or address.is_private
 
-class ProductListAPIView(generics.ListAPIView):
-    queryset = Product.objects.filter(is_available=True)
-    serializer_class = ProductSerializer
 
-class ContactCreateAPIView(generics.CreateAPIView):
-    queryset = ContactMessage.objects.all()
-    serializer_class = ContactMessageSerializer
\ No newline at end of file
+def metrics(request):
+    """Prometheus metrics aggregated across all workers."""
+    if not metrics_allowed(request):
+        return HttpResponse(status=401 if settings.METRICS_TOKEN else 403)
+    return HttpResponse(
+        render_prometheus(collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
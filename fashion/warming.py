@@ -0,0 +1,219 @@
+"""
+Cache warming: request the storefront's hot URLs before visitors do.
+
+The URLs come from fashion.urls: every page in WARM_URL_NAMES, each
+available product's page and the resized variants its cards use
+(/img/..., see fashion.imageproxy), and the sitemap and product feed.
+Requests run through the normal middleware stack, in-process or against a
+live server, so they fill the page cache, the cached AboutContent and image
+sources, and the image and feed disk caches exactly as a first visitor would. Warming only ever adds entries;
+with traffic running it at most competes for CPU, which the bounded pool
+caps.
+"""
+
+import collections
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.urls import reverse
+
+from .feeds import feed_paths
+from .models import Product
+from .popularity import popularity
+from .prerender import render_page
+
+logger = logging.getLogger(__name__)
+
+# Pages (and the API list) warmed on every run, in this order
+WARM_URL_NAMES = ['collection', 'home', 'api-product-list', 'about', 'contact']
+
+# Response headers saying whether a request was already warm
+CACHE_STATUS_HEADERS = ['X-Page-Cache', 'X-Image-Cache', 'X-Feed-Cache']
+
+
+def image_paths(product):
+    """Resized variants of a product's image its cards ask for, in both formats."""
+    if not (product.image_url or product.image):
+        return []
+    return [
+        product.get_image_variant_url(width, fmt)
+        for width in settings.IMAGE_PROXY_SRCSET_WIDTHS
+        for fmt in ('webp', 'jpg')
+    ]
+
+
+def product_paths(product):
+    return [reverse('product_detail', args=[product.slug]), *image_paths(product)]
+
+
+def crawl_urls(images=True):
+    """
+    Every URL worth warming, most valuable first: the pages named in
+    WARM_URL_NAMES, then product pages (and images), the most viewed (which
+    pages prefetch, see fashion.popularity) first and the rest newest first,
+    then the sitemap and product feed.
+    """
+    from . import urls
+
+    names = {pattern.name for pattern in urls.urlpatterns}
+    paths = [reverse(name) for name in WARM_URL_NAMES if name in names]
+    if 'product_detail' in names:
+        products = (
+            Product.objects.filter(is_available=True).order_by('-created_at')
+            .only('pk', 'slug', 'image', 'image_url')
+        )
+        popular = set(popularity.top(settings.PREFETCH_COUNT))
+        first, rest = [], []
+        for product in products.iterator(chunk_size=1000):
+            (first if product.slug in popular else rest).append(
+                product_paths(product) if images else [reverse('product_detail', args=[product.slug])]
+            )
+        paths += [path for product in first + rest for path in product]
+    if 'sitemap' in names:
+        paths += feed_paths()
+    return paths
+
+
+def popularity_paths():
+    """The pages of the products most likely to be prefetched."""
+    return [reverse('product_detail', args=[slug]) for slug in popularity.top(settings.PREFETCH_COUNT)]
+
+
+def fetch_in_process(path):
+    response = render_page(path)
+    response.close()
+    return response
+
+
+def fetch_over_http(base_url, path):
+    request = urllib.request.Request(base_url.rstrip('/') + path, headers={'Accept-Encoding': 'gzip'})
+    try:
+        with urllib.request.urlopen(request, timeout=settings.WARM_CACHE_TIMEOUT) as response:
+            response.read()
+            return response
+    except urllib.error.HTTPError as error:
+        return error
+
+
+def warm_one(fetch, path):
+    started = time.perf_counter()
+    try:
+        response = fetch(path)
+    except Exception as error:
+        logger.warning('Could not warm %s: %s', path, error)
+        status, cache_status = None, 'error'
+    else:
+        status = getattr(response, 'status_code', None) or response.status
+        headers = response.headers
+        cache_status = next((headers[name] for name in CACHE_STATUS_HEADERS if headers.get(name)), '')
+    return {
+        'path': path,
+        'status': status,
+        'cache': cache_status,
+        'ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def warm(paths, concurrency=None, base_url=None):
+    """
+    Request every path with at most `concurrency` at a time, in-process or
+    against `base_url`. Returns one {path, status, cache, ms} per path, in
+    the order given.
+    """
+    concurrency = concurrency or settings.WARM_CACHE_CONCURRENCY
+    if base_url:
+        def fetch(path):
+            return fetch_over_http(base_url, path)
+    else:
+        fetch = fetch_in_process
+    pending = collections.deque(enumerate(paths))
+    results = [None] * len(paths)
+
+    def worker():
+        while True:
+            try:
+                index, path = pending.popleft()
+            except IndexError:
+                return
+            results[index] = warm_one(fetch, path)
+
+    def worker_thread():
+        try:
+            worker()
+        finally:
+            # Threads own their connections; don't leave them open
+            connections.close_all()
+
+    if concurrency == 1:
+        worker()
+        return results
+    threads = [threading.Thread(target=worker_thread, daemon=True) for _ in range(min(concurrency, len(paths)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class Rewarmer:
+    """
+    Re-warms the storefront WARM_CACHE_DELAY seconds after edits, which
+    invalidate every cached page. Edits in between are batched; the edited
+    products' own pages and images are warmed with the WARM_URL_NAMES pages
+    and the most viewed product pages, so their prefetches hit the cache.
+    The sitemap and product feed are regenerated last, so crawlers don't have to.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._paths = []
+        self._timer = None
+
+    def add(self, paths):
+        with self._lock:
+            self._paths.extend(path for path in paths if path not in self._paths)
+            if self._timer is None:
+                self._timer = threading.Timer(settings.WARM_CACHE_DELAY, self._run_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def cancel(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._paths = []
+
+    def run(self):
+        with self._lock:
+            edited, self._paths = self._paths, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        try:
+            paths = [reverse(name) for name in WARM_URL_NAMES]
+            paths += [path for path in [*popularity_paths(), *edited] if path not in paths]
+            return warm(paths + feed_paths())
+        except Exception:
+            logger.exception('Re-warming the storefront after an edit failed')
+            return []
+
+    def _run_from_timer(self):
+        try:
+            self.run()
+        finally:
+            close_old_connections()
+
+
+rewarmer = Rewarmer()
+
+
+def on_edit(paths):
+    """Schedule re-warming after a committed edit (paths: what it touched)."""
+    if settings.WARM_CACHE_AFTER_EDIT:
+        rewarmer.add(paths)
@@ -0,0 +1,152 @@
+"""
+Gunicorn configuration for fashion_site.
+
+Used by the Procfile and .do/app.yaml:
+
+    gunicorn -c python:fashion_site.gunicorn_conf
+
+Workers and threads are sized from the CPUs and memory actually available to
+the container. Every value can be overridden with an environment variable:
+
+    SERVER_MODE          wsgi (default, gthread workers) or asgi (uvicorn workers)
+    WEB_CONCURRENCY      number of worker processes
+    WEB_THREADS          threads per gthread worker (default: DB_POOL_MAX_SIZE, else 4)
+    WEB_WORKER_MEMORY_MB expected RSS of one worker, used to fit the memory limit
+    WEB_MAX_REQUESTS     recycle a worker after this many requests (0 disables)
+    WEB_TIMEOUT          seconds before a silent worker is killed and restarted
+    WEB_KEEPALIVE        seconds to hold idle keep-alive connections
+    WEB_PRELOAD          load Django once in the master and fork (default True)
+"""
+
+import os
+from pathlib import Path
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def available_cpus():
+    """CPUs this process may run on (respects container CPU sets)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def available_memory_mb():
+    """Container memory limit in MB, falling back to the host's total memory."""
+    for limit_file in (
+        '/sys/fs/cgroup/memory.max',                     # cgroup v2
+        '/sys/fs/cgroup/memory/memory.limit_in_bytes',   # cgroup v1
+    ):
+        try:
+            value = Path(limit_file).read_text().strip()
+        except OSError:
+            continue
+        # "max" or a huge sentinel means no limit is set
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value) // (1024 * 1024)
+    try:
+        for line in Path('/proc/meminfo').read_text().splitlines():
+            if line.startswith('MemTotal:'):
+                return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return 512
+
+
+def default_workers(cpus, memory_mb, worker_memory_mb):
+    """
+    The classic 2 * CPUs + 1, capped so the workers fit in 75% of memory
+    (the rest is headroom for the master, page cache and upload spooling).
+    """
+    by_cpu = 2 * cpus + 1
+    by_memory = int(memory_mb * 0.75) // worker_memory_mb
+    return max(1, min(by_cpu, by_memory))
+
+
+# Threads per worker when neither WEB_THREADS nor DB_POOL_MAX_SIZE is set. With
+# the page cache most requests never wait on I/O, so extra threads only contend
+# for the GIL; 4 covers the DB queries and Cloudinary uploads that do wait.
+DEFAULT_THREADS = 4
+
+LOCMEM_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+SHARED_CACHE_DEFAULT = 'django.core.cache.backends.filebased.FileBasedCache'
+
+
+def shared_cache_backend(workers):
+    """
+    The cache backend Django should use with `workers` processes. Catalogue
+    generations, AboutContent, contact dedup and throttling and popularity
+    all live in the cache, so several workers must share one: default to the
+    file-based cache, and refuse an explicit per-process LocMemCache.
+    """
+    backend = os.getenv('CACHE_BACKEND')
+    if workers <= 1:
+        return backend
+    if backend == LOCMEM_CACHE:
+        raise RuntimeError(
+            f'CACHE_BACKEND={LOCMEM_CACHE} is per process; with {workers} workers use a shared '
+            f'backend (Redis or {SHARED_CACHE_DEFAULT}) or set WEB_CONCURRENCY=1.'
+        )
+    return backend or SHARED_CACHE_DEFAULT
+
+
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+workers = _env_int(
+    'WEB_CONCURRENCY',
+    default_workers(available_cpus(), available_memory_mb(), _env_int('WEB_WORKER_MEMORY_MB', 150)),
+)
+
+# Read by fashion_site.settings, which is imported after this file
+cache_backend = shared_cache_backend(workers)
+if cache_backend:
+    os.environ['CACHE_BACKEND'] = cache_backend
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'fashion_site.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'fashion_site.wsgi:application'
+    # Threads let one worker overlap DB and upload waits; Django is thread-safe.
+    # A thread beyond the worker's DB pool would only wait for a connection.
+    worker_class = 'gthread'
+    threads = _env_int('WEB_THREADS', _env_int('DB_POOL_MAX_SIZE', DEFAULT_THREADS))
+
+# Import Django once in the master; workers share those pages copy-on-write
+preload_app = os.getenv('WEB_PRELOAD', 'True') == 'True'
+
+# Recycle workers to cap slow memory growth; jitter avoids all restarting at once
+max_requests = _env_int('WEB_MAX_REQUESTS', 1000)
+max_requests_jitter = max(1, max_requests // 10) if max_requests else 0
+
+timeout = _env_int('WEB_TIMEOUT', 30)
+graceful_timeout = 30
+keepalive = _env_int('WEB_KEEPALIVE', 5)
+
+# Heartbeat files on tmpfs - a disk-backed /tmp can stall workers in containers
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+errorlog = '-'
+accesslog = os.getenv('WEB_ACCESS_LOG') or None
+
+
+def on_starting(server):
+    # Each server run starts with fresh metrics (see fashion.metrics)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fashion_site.settings')
+    from fashion.metrics import reset_metrics_dir
+    reset_metrics_dir()
+
+
+def post_fork(server, worker):
+    # Never share a DB connection opened in the master before forking
+    if not server.cfg.preload_app:
+        return
+    from django.db import connections
+    connections.close_all()
@@ -11,7 +11,10 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import importlib.util
 import os
+import tempfile
+from urllib.parse import urlsplit
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -43,8 +46,6 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'cloudinary_storage',
-    'cloudinary',
     'fashion',
     'rest_framework',
 ]
@@ -52,6 +53,12 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Serve static files in production
+    'fashion.middleware.MetricsMiddleware',  # Per-route request metrics for /metrics
+    'fashion.middleware.ProfilingMiddleware',  # Server-Timing + per-request perf logs
+    'fashion.middleware.PopularityMiddleware',  # Product views for prefetch ranking
+    'fashion.middleware.PrerenderMiddleware',  # Serve prerendered storefront pages from disk
+    'fashion.middleware.HTMLPipelineMiddleware',  # Minify, compress and page-cache HTML
+    'fashion.middleware.ReplicaRoutingMiddleware',  # Storefront reads -> read replicas
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -87,22 +94,83 @@ import dj_database_url
 # Use DATABASE_URL if available (DigitalOcean), otherwise SQLite for local dev
 DATABASE_URL = os.getenv('DATABASE_URL')
 
+# Connection pooling (Postgres via psycopg 3's pool, Django 5.1+). Each worker
+# process keeps its own pool, so the server opens at most
+# WEB_CONCURRENCY * DB_POOL_MAX_SIZE connections. Only look the package up:
+# importing psycopg costs ~100ms of every boot, even on SQLite.
+DB_POOL_AVAILABLE = importlib.util.find_spec('psycopg_pool') is not None
+
+DB_POOL = DB_POOL_AVAILABLE and os.getenv('DB_POOL', 'True') == 'True'
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', os.getenv('WEB_THREADS', '4')))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', '600'))
+
 if DATABASE_URL:
     DATABASES = {
         'default': dj_database_url.config(
             default=DATABASE_URL,
-            conn_max_age=600,
-            conn_health_checks=True,
+            # Pooled connections replace persistent ones (Django forbids both)
+            conn_max_age=0 if DB_POOL else DB_CONN_MAX_AGE,
+            conn_health_checks=not DB_POOL,
         )
     }
+    if DB_POOL and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+        DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+        }
 else:
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'OPTIONS': {
+                # WAL lets readers run alongside the dashboard's writes;
+                # NORMAL sync is durable in WAL mode and avoids an fsync per commit.
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA mmap_size=134217728;'
+                    'PRAGMA temp_store=MEMORY'
+                ),
+                # Take the write lock up front instead of failing mid-transaction
+                'transaction_mode': 'IMMEDIATE',
+            },
         }
     }
 
+# Read replicas: comma-separated URLs, e.g. two local SQLite files with
+# DATABASE_REPLICA_URL=sqlite:///db-replica.sqlite3
+# (create it with: python manage.py migrate --database replica_0)
+DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL', '')
+REPLICA_DATABASES = []
+
+for index, replica_url in enumerate(url.strip() for url in DATABASE_REPLICA_URL.split(',') if url.strip()):
+    alias = f'replica_{index}'
+    DATABASES[alias] = dj_database_url.parse(
+        replica_url,
+        conn_max_age=0 if DB_POOL else DB_CONN_MAX_AGE,
+        conn_health_checks=not DB_POOL,
+    )
+    if 'pool' in DATABASES['default'].get('OPTIONS', {}) and \
+            DATABASES[alias]['ENGINE'] == 'django.db.backends.postgresql':
+        DATABASES[alias].setdefault('OPTIONS', {})['pool'] = dict(DATABASES['default']['OPTIONS']['pool'])
+    # Tests see a single database
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    REPLICA_DATABASES.append(alias)
+
+if REPLICA_DATABASES:
+    DATABASE_ROUTERS = ['fashion.routers.ReplicaRouter']
+
+# Views whose anonymous GETs may be served from a replica
+REPLICA_READ_URL_NAMES = ['home', 'collection', 'about', 'product_detail', 'api-product-list']
+# After a write, reads stay on the primary for this long (replication lag budget)
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', '15'))
+REPLICA_STICKY_COOKIE = 'primary_pin'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -156,8 +224,19 @@ STATICFILES_DIRS = [
 # Where collectstatic will put files for production
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
-# WhiteNoise compression and caching
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# WhiteNoise compression and caching, plus the generated service worker
+# (STATICFILES_STORAGE is ignored since Django 5.1; storages live in STORAGES)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'fashion.storage.ServiceWorkerStaticFilesStorage',
+    },
+}
+
+# Runtime cache of the service worker: product images kept for offline use
+SERVICE_WORKER_MAX_IMAGES = int(os.getenv('SERVICE_WORKER_MAX_IMAGES', '120'))
 
 # ======================
 # CLOUDINARY (Production Media Storage)
@@ -165,6 +244,9 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 CLOUDINARY_URL = os.getenv('CLOUDINARY_URL')
 
 if CLOUDINARY_URL:
+    # The Cloudinary apps (and their slow SDK import) only load when configured
+    INSTALLED_APPS += ['cloudinary_storage', 'cloudinary']
+
     # Use Cloudinary for media storage
     CLOUDINARY_STORAGE = {
         'CLOUDINARY_URL': CLOUDINARY_URL,
@@ -177,6 +259,139 @@ else:
     MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 
+# ======================
+# CACHING
+# ======================
+# LocMem is per-process: fine for one worker and for development. With more
+# gunicorn workers, fashion_site/gunicorn_conf.py switches the default to the
+# file-based cache (and refuses LocMem), so invalidation reaches all of them.
+# Use Redis (django.core.cache.backends.redis.RedisCache) across instances.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+FILE_CACHE = CACHE_BACKEND.endswith('FileBasedCache')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache') if FILE_CACHE else 'domemily'),
+    }
+}
+if FILE_CACHE or CACHE_BACKEND.endswith('LocMemCache'):
+    # Django's default of 300 entries is a few dozen pages in every encoding
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '5000'))}
+
+# Storefront pages served from the page cache (see fashion.middleware)
+PAGE_CACHE_URL_NAMES = ['home', 'collection', 'about', 'contact', 'product_detail', 'offline']
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', '600'))
+
+# Public origin of the site, e.g. https://www.example.com. Absolute URLs in
+# sitemap.xml and the product feed use it whatever Host a request came with.
+SITE_URL = os.getenv('SITE_URL', '').rstrip('/')
+
+# Static prerendering of the storefront (see fashion.prerender). Off until
+# `python manage.py prerender` has built PRERENDER_ROOT on this host.
+PRERENDER_ROOT = os.getenv('PRERENDER_ROOT', os.path.join(BASE_DIR, 'prerendered'))
+# Host name the pages are rendered for
+PRERENDER_HOST = os.getenv('PRERENDER_HOST', urlsplit(SITE_URL).hostname or 'localhost')
+# Seconds after an edit before its pages are regenerated (edits in between are batched)
+PRERENDER_DELAY = float(os.getenv('PRERENDER_DELAY', '2'))
+
+# sitemap.xml and the product feed (see fashion.feeds), kept on disk per
+# catalogue generation. Sitemap pages hold at most SITEMAP_MAX_URLS URLs.
+FEED_CACHE_DIR = os.getenv('FEED_CACHE_DIR', os.path.join(BASE_DIR, 'feedcache'))
+SITEMAP_MAX_URLS = int(os.getenv('SITEMAP_MAX_URLS', '50000'))
+FEED_CHUNK_SIZE = int(os.getenv('FEED_CHUNK_SIZE', '2000'))
+FEED_CURRENCY = os.getenv('FEED_CURRENCY', 'GHS')
+
+# Speculative prefetching of product pages (see fashion.popularity): how many
+# of the most viewed products linked from a page are prefetched right away
+PREFETCH_COUNT = int(os.getenv('PREFETCH_COUNT', '3'))
+# Views are merged into the shared counts at most this often (seconds)...
+POPULARITY_FLUSH_INTERVAL = float(os.getenv('POPULARITY_FLUSH_INTERVAL', '10'))
+# ...and ranked over this many hours
+POPULARITY_WINDOW_HOURS = int(os.getenv('POPULARITY_WINDOW_HOURS', '24'))
+
+# Cache warming (see fashion.warming and `manage.py warm_cache`)
+WARM_CACHE_CONCURRENCY = int(os.getenv('WARM_CACHE_CONCURRENCY', '4'))
+WARM_CACHE_TIMEOUT = float(os.getenv('WARM_CACHE_TIMEOUT', '30'))
+# Re-warm the storefront this many seconds after a catalogue or About page edit
+WARM_CACHE_AFTER_EDIT = os.getenv('WARM_CACHE_AFTER_EDIT', 'True') == 'True'
+WARM_CACHE_DELAY = float(os.getenv('WARM_CACHE_DELAY', '3'))
+
+# Resized product images at /img/<id>/<width>.<fmt> (see fashion.imageproxy)
+IMAGE_PROXY_WIDTHS = [int(width) for width in os.getenv('IMAGE_PROXY_WIDTHS', '200,400,600,800,1200,1600').split(',')]
+# Widths offered in the storefront's srcset attributes
+IMAGE_PROXY_SRCSET_WIDTHS = [400, 800]
+# Variant URLs carry a ?v= version of the image, so a replaced image gets new
+# URLs and the old ones can be cached for good; URLs without the current
+# version are only cached briefly and then revalidated by ETag
+IMAGE_PROXY_MAX_AGE = int(os.getenv('IMAGE_PROXY_MAX_AGE', str(365 * 24 * 3600)))
+IMAGE_PROXY_UNVERSIONED_MAX_AGE = int(os.getenv('IMAGE_PROXY_UNVERSIONED_MAX_AGE', '300'))
+IMAGE_PROXY_TIMEOUT = float(os.getenv('IMAGE_PROXY_TIMEOUT', '10'))
+IMAGE_PROXY_MAX_SOURCE_BYTES = int(os.getenv('IMAGE_PROXY_MAX_SOURCE_BYTES', str(20 * 1024 * 1024)))
+# Larger images (width x height) are never decoded: a small file can expand
+# to gigabytes of pixels
+IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS', str(40_000_000)))
+# Disk cache of variants and remote originals, least recently used evicted first
+IMAGE_CACHE_DIR = os.getenv('IMAGE_CACHE_DIR', os.path.join(BASE_DIR, 'imagecache'))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv('IMAGE_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+
+# Admin changelists show the Postgres planner's row estimate instead of an
+# exact COUNT(*) once a table is larger than this (see fashion.pagination)
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(os.getenv('ADMIN_ESTIMATED_COUNT_THRESHOLD', '10000'))
+
+
+# ======================
+# CONTACT INGESTION
+# ======================
+# Reverse proxies in front of the app (the platform router counts as one).
+# Client IPs come from the X-Forwarded-For entries they appended, never from
+# ones the client sent itself
+NUM_PROXIES = int(os.getenv('NUM_PROXIES', '0' if DEBUG else '1'))
+REST_FRAMEWORK = {
+    'NUM_PROXIES': NUM_PROXIES,
+}
+# Per-IP token bucket for /api/contact/: a burst of this many messages...
+CONTACT_THROTTLE_BURST = int(os.getenv('CONTACT_THROTTLE_BURST', '3'))
+# ...then this many per minute
+CONTACT_THROTTLE_RATE = float(os.getenv('CONTACT_THROTTLE_RATE', '2'))
+# Identical messages from the same sender within this window are dropped
+CONTACT_DEDUP_SECONDS = int(os.getenv('CONTACT_DEDUP_SECONDS', '86400'))
+# Buffered messages are bulk-inserted when this many are waiting...
+CONTACT_BATCH_SIZE = int(os.getenv('CONTACT_BATCH_SIZE', '20'))
+# ...or this many seconds after the first one arrived
+CONTACT_FLUSH_INTERVAL = float(os.getenv('CONTACT_FLUSH_INTERVAL', '2'))
+
+
+# ======================
+# PERFORMANCE PROFILING
+# ======================
+# Requests slower than this log their SQL (and a cProfile dump if sampled)
+PROFILING_SLOW_REQUEST_MS = float(os.getenv('PROFILING_SLOW_REQUEST_MS', '500'))
+# Share of requests run under cProfile (0.0 - 1.0)
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0.01'))
+PROFILING_DUMP_DIR = os.getenv('PROFILING_DUMP_DIR', os.path.join(BASE_DIR, 'profiles'))
+
+# Per-worker metric files merged by the /metrics endpoint (see fashion.metrics)
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'domemily-metrics'))
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '1'))
+# Bearer token required to scrape /metrics. Without one, production only
+# serves it to direct (unproxied) requests from private addresses
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'fashion': {
+            'handlers': ['console'],
+            'level': os.getenv('FASHION_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
+
 # ======================
 # PRODUCTION SECURITY
 # ======================
@@ -184,6 +399,8 @@ if not DEBUG:
     # HTTPS Settings
     SECURE_SSL_REDIRECT = True
     SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+    # Platform health probes call the app directly over plain HTTP
+    SECURE_REDIRECT_EXEMPT = [r'^healthz/$', r'^readyz/$', r'^metrics$']
     
     # HSTS Settings (be careful - this is hard to undo!)
     SECURE_HSTS_SECONDS = 31536000  # 1 year